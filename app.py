@@ -3,6 +3,7 @@ import ssl
 import base64
 import logging
 import smtplib
+from threading import Lock
 from urllib.request import urlopen
 from flask import Flask, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
@@ -14,7 +15,8 @@ from email.mime.image import MIMEImage
 from email.utils import formataddr
 
 # ZEVIX Route laden
-from routes.zevix import zevix_bp
+from routes.zevix import get_conn, zevix_bp
+from routes.migrations import run_migrations
 
 logging.basicConfig(level=logging.INFO)
 
@@ -45,10 +47,34 @@ app.config.update(
 
 app.register_blueprint(zevix_bp)
 
+# Schema-Migrationen einmal pro Worker beim Start (nicht pro Request).
+# Schlägt der Lauf fehl (z. B. DB beim Deploy kurz weg), wird er beim
+# nächsten Request wiederholt, bis er einmal durchläuft.
+MIGRATIONS_LOCK = Lock()
+migrations_done = False
+
+
+def ensure_migrations() -> None:
+    global migrations_done
+    if migrations_done or not MIGRATIONS_LOCK.acquire(blocking=False):
+        return
+    try:
+        with get_conn() as conn:
+            run_migrations(conn)
+        migrations_done = True
+    except Exception as exc:
+        logging.error("Schema migrations failed: %s", exc)
+    finally:
+        MIGRATIONS_LOCK.release()
+
+
+ensure_migrations()
+
 
 @app.before_request
 def log_request():
     logging.info("Incoming request: %s %s from %s", request.method, request.path, request.remote_addr)
+    ensure_migrations()
 
 
 @app.route("/zevix/login", methods=["OPTIONS"])
@@ -2,18 +2,28 @@
 """
 Backfill script to load historical SHAB data.
 Usage: python backfill_shab.py --days 30
+       python backfill_shab.py --days 365 --workers 8
+       python backfill_shab.py --start-date 2026-01-01 --replay   (from the local archive, no API calls)
+
+Consecutive quiet days are fetched together in multi-day windows sized from
+the daily volumes seen so far (--per-day for one request per day).
+
+Progress is tracked per day in shab_sync_state: completed days are skipped
+(unless --force) and an interrupted day resumes at its last committed page.
 """
 
 import os
 import sys
 import logging
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from datetime import date, timedelta
 
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s'
 )
 
 # Add project root to path
@@ -21,123 +31,64 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from routes.zevix import (
     get_conn,
-    fetch_shab_neueintragungen,
-    ai_branche,
-    ensure_leads_table,
-    RECHTSFORMEN,
+    create_conn_pool,
 )
+from routes.migrations import run_migrations
+from routes.shab_ingest import new_stats
+from routes.shab_planner import estimate_daily_volume, plan_windows, sync_window
+from routes.shab_sync import get_sync_states, sync_shab_date
+
 
+def backfill_date(target_date: str, pool=None, replay: bool = False):
+    """Backfill leads for a single date.
 
-def backfill_date(target_date: str):
-    """Backfill leads for a single date."""
+    With a pool, a connection is borrowed from it; otherwise a fresh one is opened.
+    With ``replay`` the publications are read from the local SHAB archive.
+    The ingestion tables must already exist (see main).
+    """
 
     logging.info("--- Processing %s ---", target_date)
 
+    stats = new_stats()
     try:
-        publications = fetch_shab_neueintragungen(target_date, target_date)
-        logging.info("  Fetched %d entries", len(publications) if publications else 0)
+        with (pool.connection() if pool else get_conn()) as conn:
+            sync_shab_date(conn, target_date, log_prefix=f"  {target_date}", replay=replay, stats=stats)
+
     except Exception as exc:
-        logging.error("  SHAB API error: %s", exc)
-        return 0, 0, 0
+        logging.error("  Sync error after %d entries (resumes on next run): %s", stats["total"], exc)
+        return stats["inserted"], stats["updated"], stats["errors"] + 1
+
+    logging.info(
+        "  Done %s: %d fetched, +%d inserted, ~%d updated, =%d unchanged, %d duplicates, %d errors",
+        target_date, stats["total"], stats["inserted"], stats["updated"],
+        stats["skipped_unchanged"], stats["duplicates"], stats["errors"],
+    )
+    return stats["inserted"], stats["updated"], stats["errors"]
 
-    if not publications:
-        return 0, 0, 0
 
-    inserted = 0
-    updated = 0
-    errors = 0
+def backfill_window(window: tuple[date, date], pool=None):
+    """Backfill a planned multi-day window (see routes/shab_planner.py)."""
+    start, end = window
+    if start == end:
+        return backfill_date(start.isoformat(), pool=pool)
 
+    logging.info("--- Processing %s to %s ---", start, end)
+
+    stats = new_stats()
     try:
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                ensure_leads_table(cur)
-                conn.commit()
-
-                for i, pub in enumerate(publications):
-                    uid = ""
-                    try:
-                        meta = pub.get("meta", {})
-                        content = pub.get("content", {})
-                        commons = content.get("commonsNew", {}) or content.get("commonsActual", {})
-                        company = commons.get("company", {})
-                        address = company.get("address", {})
-
-                        uid = company.get("uid") or ""
-                        if not uid:
-                            continue
-
-                        firma = company.get("name") or ""
-                        rechtsform_code = company.get("legalForm") or ""
-                        rechtsform = RECHTSFORMEN.get(str(rechtsform_code), str(rechtsform_code))
-
-                        strasse = address.get("street") or ""
-                        hausnummer = address.get("houseNumber") or ""
-                        plz = str(address.get("swissZipCode") or "")
-                        ort = address.get("town") or ""
-                        sitz = company.get("seat") or ort
-
-                        cantons = meta.get("cantons") or []
-                        kanton = cantons[0] if cantons else ""
-
-                        zweck = commons.get("purpose") or ""
-
-                        pub_date_raw = meta.get("publicationDate") or ""
-                        pub_date = pub_date_raw[:10] if pub_date_raw else None
-
-                        # GPT Classification
-                        branche = ""
-                        if zweck:
-                            try:
-                                logging.info("    [%d/%d] %s", i + 1, len(publications), firma[:40])
-                                branche = ai_branche(zweck)
-                            except Exception as gpt_err:
-                                logging.warning("    GPT error: %s", gpt_err)
-                                branche = ""
-
-                        cur.execute(
-                            """
-                            INSERT INTO leads
-                                (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                                 sitz, kanton, zweck, branche_ai, publikation_datum)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (uid) DO UPDATE SET
-                                firma = EXCLUDED.firma,
-                                rechtsform = EXCLUDED.rechtsform,
-                                strasse = EXCLUDED.strasse,
-                                hausnummer = EXCLUDED.hausnummer,
-                                plz = EXCLUDED.plz,
-                                ort = EXCLUDED.ort,
-                                sitz = EXCLUDED.sitz,
-                                kanton = EXCLUDED.kanton,
-                                zweck = EXCLUDED.zweck,
-                                branche_ai = EXCLUDED.branche_ai,
-                                publikation_datum = EXCLUDED.publikation_datum
-                            RETURNING (xmax = 0) AS inserted
-                            """,
-                            (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                             sitz, kanton, zweck, branche, pub_date)
-                        )
-
-                        row = cur.fetchone()
-                        if row and row.get("inserted"):
-                            inserted += 1
-                        else:
-                            updated += 1
-
-                        conn.commit()
-
-                    except Exception as exc:
-                        logging.warning("    Error %s: %s", uid or "unknown", exc)
-                        errors += 1
-                        conn.rollback()
-                        continue
+        with (pool.connection() if pool else get_conn()) as conn:
+            sync_window(conn, start, end, log_prefix="  window", stats=stats)
 
     except Exception as exc:
-        logging.error("  Database error: %s", exc)
-        return 0, 0, len(publications)
+        logging.error("  Sync error after %d entries (resumes on next run): %s", stats["total"], exc)
+        return stats["inserted"], stats["updated"], stats["errors"] + 1
 
-    logging.info("  Done: +%d inserted, ~%d updated, %d errors", inserted, updated, errors)
-    return inserted, updated, errors
+    logging.info(
+        "  Done %s to %s: %d fetched in %d requests, +%d inserted, ~%d updated, =%d unchanged, %d errors",
+        start, end, stats["total"], stats["pages"], stats["inserted"], stats["updated"],
+        stats["skipped_unchanged"], stats["errors"],
+    )
+    return stats["inserted"], stats["updated"], stats["errors"]
 
 
 def main():
@@ -145,6 +96,10 @@ def main():
     parser.add_argument("--days", type=int, default=30, help="Number of days to backfill (default: 30)")
     parser.add_argument("--start-date", type=str, help="Start date (YYYY-MM-DD), overrides --days")
     parser.add_argument("--end-date", type=str, help="End date (YYYY-MM-DD), default: yesterday")
+    parser.add_argument("--workers", type=int, default=1, help="Number of days processed in parallel (default: 1)")
+    parser.add_argument("--replay", action="store_true", help="Re-ingest from the local SHAB archive instead of the API")
+    parser.add_argument("--force", action="store_true", help="Also re-sync days that already completed")
+    parser.add_argument("--per-day", action="store_true", help="One request per day instead of planned multi-day windows")
     args = parser.parse_args()
 
     # Calculate date range
@@ -157,21 +112,63 @@ def main():
     else:
         start_date = end_date - timedelta(days=args.days - 1)
 
+    # Schema check once for the whole run instead of once per day
+    with get_conn() as conn:
+        run_migrations(conn)
+        states = get_sync_states(conn, start_date.isoformat(), end_date.isoformat())
+        volume = estimate_daily_volume(conn)
+
+    dates = []
+    skipped = 0
+    current_date = start_date
+    while current_date <= end_date:
+        state = states.get(current_date.isoformat())
+        if state and state["status"] == "done" and not (args.force or args.replay):
+            skipped += 1
+        else:
+            dates.append(current_date.isoformat())
+        current_date += timedelta(days=1)
+
+    # (label, task); each task is called with an optional pool= keyword
+    if args.replay or args.per_day:
+        tasks = [(d, partial(backfill_date, d, replay=args.replay)) for d in dates]
+    else:
+        windows = plan_windows([date.fromisoformat(d) for d in dates], volume)
+        tasks = [(f"{start} to {end}", partial(backfill_window, (start, end))) for start, end in windows]
+
+    workers = max(1, min(args.workers, len(tasks) or 1))
+
     logging.info("=" * 60)
-    logging.info("BACKFILL: %s to %s (%d days)", start_date, end_date, (end_date - start_date).days + 1)
+    logging.info(
+        "BACKFILL: %s to %s (%d days in %d batches, %d already done, %d workers%s)",
+        start_date, end_date, len(dates), len(tasks), skipped, workers,
+        ", replay from archive" if args.replay else "",
+    )
     logging.info("=" * 60)
 
     total_inserted = 0
     total_updated = 0
     total_errors = 0
 
-    current_date = start_date
-    while current_date <= end_date:
-        inserted, updated, errors = backfill_date(current_date.isoformat())
-        total_inserted += inserted
-        total_updated += updated
-        total_errors += errors
-        current_date += timedelta(days=1)
+    if workers == 1:
+        for _, task in tasks:
+            inserted, updated, errors = task()
+            total_inserted += inserted
+            total_updated += updated
+            total_errors += errors
+    else:
+        with create_conn_pool(max_size=workers) as pool:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as executor:
+                futures = {executor.submit(task, pool=pool): label for label, task in tasks}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    inserted, updated, errors = future.result()
+                    total_inserted += inserted
+                    total_updated += updated
+                    total_errors += errors
+                    logging.info(
+                        "Progress: %d/%d batches (%s), totals +%d/~%d/%d errors",
+                        done, len(tasks), futures[future], total_inserted, total_updated, total_errors,
+                    )
 
     logging.info("=" * 60)
     logging.info("BACKFILL COMPLETED")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark GPT sector classification: one request per purpose vs. batched prompts.
+Runs both modes over the same recent purpose texts and compares wall time,
+token usage, estimated cost and agreement with the stored branche_ai labels.
+First checks the keyword rules against known boilerplate cases (no API calls).
+Usage: python bench_branche.py --limit 200 --batch-size 20
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Add project root to path so routes package can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes.zevix import get_conn
+from routes.branche import OPENAI_CONCURRENCY, OPENAI_MODEL, canonical_branche, classify_many, openai_usage, rule_branche
+
+# USD per 1M tokens (input, output) for gpt-4.1-mini
+PRICE_INPUT = float(os.getenv("OPENAI_PRICE_INPUT", "0.40"))
+PRICE_OUTPUT = float(os.getenv("OPENAI_PRICE_OUTPUT", "1.60"))
+
+# The standard "Die Gesellschaft kann ... Grundeigentum erwerben" clause must
+# not decide the sector (None = left to the model / GPT)
+RULE_REGRESSIONS = [
+    ("Betrieb eines Coiffeursalons. Die Gesellschaft kann Zweigniederlassungen errichten, "
+     "Grundeigentum erwerben, belasten, veräussern und verwalten.", None),
+    ("Reinigung von Gebäuden und Büros. Die Gesellschaft kann Liegenschaften erwerben, "
+     "belasten und veräussern.", "Dienstleistungen"),
+    ("Beratung von Unternehmen in Management- und Organisationsfragen. Sie kann Grundstücke "
+     "erwerben, halten und veräussern.", "Dienstleistungen"),
+    ("Betrieb eines Restaurants mit Take-away. Die Gesellschaft kann Grundeigentum erwerben.", "Gastronomie"),
+    ("Erwerb, Verwaltung und Vermietung von Liegenschaften. Die Gesellschaft kann sich an "
+     "anderen Unternehmen beteiligen.", "Immobilien"),
+]
+
+
+def check_rules() -> int:
+    """Log keyword-rule results for RULE_REGRESSIONS. Returns the number of mismatches."""
+    failed = 0
+    for zweck, expected in RULE_REGRESSIONS:
+        got = rule_branche(zweck)
+        if got != expected:
+            failed += 1
+            logging.warning("Rule regression: expected %s, got %s for %r", expected, got, zweck[:60])
+    logging.info("Rule regressions: %d/%d ok", len(RULE_REGRESSIONS) - failed, len(RULE_REGRESSIONS))
+    return failed
+
+
+def run(zwecke: list[str], batch_size: int, workers: int) -> tuple[list[str], dict]:
+    before = openai_usage()
+    started = time.monotonic()
+    branchen = classify_many(zwecke, max_workers=workers, batch_size=batch_size, log_prefix=f"bench b{batch_size}")
+    elapsed = time.monotonic() - started
+    after = openai_usage()
+
+    result = {key: after[key] - before[key] for key in after}
+    result["seconds"] = elapsed
+    result["cost"] = (result["prompt_tokens"] * PRICE_INPUT + result["completion_tokens"] * PRICE_OUTPUT) / 1_000_000
+    result["failed"] = sum(1 for branche in branchen if not branche)
+    return branchen, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-item vs batched GPT sector classification")
+    parser.add_argument("--limit", type=int, default=200, help="Number of recent purpose texts (default: 200)")
+    parser.add_argument("--batch-size", type=int, default=20, help="Purpose texts per batched request (default: 20)")
+    parser.add_argument("--workers", type=int, default=OPENAI_CONCURRENCY, help="Concurrent requests")
+    args = parser.parse_args()
+
+    check_rules()
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT zweck, branche_ai
+                FROM (
+                    SELECT DISTINCT ON (zweck) zweck, branche_ai, publikation_datum, id
+                    FROM leads
+                    WHERE coalesce(zweck, '') <> ''
+                    ORDER BY zweck, publikation_datum DESC NULLS LAST, id DESC
+                ) latest
+                ORDER BY publikation_datum DESC NULLS LAST, id DESC
+                LIMIT %s
+                """,
+                (args.limit,),
+            )
+            samples = [(row["zweck"], row["branche_ai"]) for row in cur.fetchall()]
+
+    zwecke = [zweck for zweck, _ in samples]
+    stored = [canonical_branche(branche) for _, branche in samples]
+    logging.info("Benchmark: %d purpose texts, model %s, %d workers", len(zwecke), OPENAI_MODEL, args.workers)
+
+    single, single_stats = run(zwecke, 1, args.workers)
+    batched, batched_stats = run(zwecke, args.batch_size, args.workers)
+
+    logging.info("=== Per-item vs. batched (batch size %d) ===", args.batch_size)
+    for name, branchen, stats in (("per-item", single, single_stats), ("batched", batched, batched_stats)):
+        agree = sum(1 for a, b in zip(branchen, stored) if b and canonical_branche(a) == b)
+        logging.info(
+            "  %-8s %6.1fs  %5.1f texts/s  %4d requests  %7d in / %6d out tokens  $%.4f  %d failed  %.1f%% agree with stored",
+            name, stats["seconds"], len(zwecke) / stats["seconds"] if stats["seconds"] else 0.0,
+            stats["requests"], stats["prompt_tokens"], stats["completion_tokens"], stats["cost"],
+            stats["failed"], agree / len(zwecke) * 100 if zwecke else 0.0,
+        )
+
+    same = sum(1 for a, b in zip(single, batched) if canonical_branche(a) == canonical_branche(b))
+    logging.info("  Batched matches per-item on %d/%d texts", same, len(zwecke))
+    if single_stats["cost"]:
+        logging.info("  Cost ratio batched/per-item: %.2f", batched_stats["cost"] / single_stats["cost"])
+
+
+if __name__ == "__main__":
+    main()
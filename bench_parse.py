@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark SHAB publication parsing over an archived day (no network, no database).
+Measures parse throughput of parse_publication and the memory held per parsed
+row, as LeadRecord and as the equivalent dict.
+Usage: python bench_parse.py --date 2026-02-25 --repeat 20
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tracemalloc
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Add project root to path so routes package can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes.shab_archive import iter_archived_publications
+from routes.shab_ingest import parse_publication
+
+
+def measure_memory(build) -> int:
+    """Bytes still allocated after build() (the rows it returns are kept alive)."""
+    tracemalloc.start()
+    try:
+        snapshot_before = tracemalloc.take_snapshot()
+        rows = build()
+        snapshot_after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    size = sum(stat.size_diff for stat in snapshot_after.compare_to(snapshot_before, "filename"))
+    del rows
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SHAB parsing over an archived day")
+    parser.add_argument("--date", required=True, help="Archived publication date (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="Last date of a range (default: --date)")
+    parser.add_argument("--repeat", type=int, default=10, help="Parse passes over the day (default: 10)")
+    args = parser.parse_args()
+
+    publications = list(iter_archived_publications(args.date, args.end_date or args.date))
+    if not publications:
+        logging.error("No archived publications for %s (SHAB archive disabled or empty?)", args.date)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    for _ in range(max(1, args.repeat)):
+        rows = [row for row in map(parse_publication, publications) if row]
+    elapsed = time.perf_counter() - started
+    parsed = len(publications) * max(1, args.repeat)
+
+    record_bytes = measure_memory(lambda: [row for row in map(parse_publication, publications) if row])
+    dict_bytes = measure_memory(lambda: [row._asdict() for row in map(parse_publication, publications) if row])
+
+    logging.info("=== Parse benchmark %s (%d publications, %d rows, %d passes) ===",
+                 args.date, len(publications), len(rows), max(1, args.repeat))
+    logging.info("  %.1f µs/publication, %.0f publications/s", elapsed / parsed * 1e6, parsed / elapsed)
+    if rows:
+        logging.info("  LeadRecord: %6.0f bytes/row", record_bytes / len(rows))
+        logging.info("  dict:       %6.0f bytes/row", dict_bytes / len(rows))
+
+
+if __name__ == "__main__":
+    main()
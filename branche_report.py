@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Precision/coverage report for the keyword fast path in front of GPT.
+Compares rule_branche against the existing branche_ai labels in leads.
+Usage: python branche_report.py --limit 5000
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Add project root to path so routes package can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes.zevix import get_conn
+from routes.branche import evaluate_rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate keyword sector rules against GPT labels")
+    parser.add_argument("--limit", type=int, default=5000, help="Number of most recent leads to evaluate (default: 5000)")
+    parser.add_argument("--gpt-latency", type=float, default=0.8, help="Average seconds per GPT call, for the savings estimate")
+    args = parser.parse_args()
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT zweck, branche_ai
+                FROM leads
+                WHERE coalesce(zweck, '') <> '' AND coalesce(branche_ai, '') <> ''
+                ORDER BY publikation_datum DESC NULLS LAST, id DESC
+                LIMIT %s
+                """,
+                (args.limit,),
+            )
+            samples = [(row["zweck"], row["branche_ai"]) for row in cur.fetchall()]
+
+    report = evaluate_rules(samples)
+
+    logging.info("=== Keyword rules vs. GPT labels ===")
+    logging.info("  Samples: %d", report["total"])
+    logging.info("  Coverage: %.1f%% (%d decided locally)", report["coverage"] * 100, report["decided"])
+    logging.info("  Precision: %.1f%% (%d agree with GPT)", report["precision"] * 100, report["correct"])
+    for branche, entry in sorted(report["per_branche"].items(), key=lambda item: -item[1]["decided"]):
+        logging.info(
+            "    %-22s decided=%5d precision=%.1f%%",
+            branche, entry["decided"], entry["precision"] * 100,
+        )
+
+    # Per-sync savings: one avoided GPT call per locally decided purpose
+    logging.info("  Saved per 1000 publications: ~%d API calls, ~%.0fs sequential GPT latency",
+                 report["coverage"] * 1000, report["coverage"] * 1000 * args.gpt_latency)
+
+
+if __name__ == "__main__":
+    main()
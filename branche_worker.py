@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Worker that drains the branche_pending queue and fills in missing sectors.
+Run directly: python branche_worker.py
+              python branche_worker.py --enqueue-missing --workers 4
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Add project root to path so routes package can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes.zevix import get_conn
+from routes.branche import OPENAI_CONCURRENCY
+from routes.branche_queue import (
+    BRANCHE_PENDING_BATCH_SIZE,
+    enqueue_missing_branchen,
+    pending_count,
+    process_branche_pending,
+)
+from routes.migrations import run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify leads queued in branche_pending")
+    parser.add_argument("--batch-size", type=int, default=BRANCHE_PENDING_BATCH_SIZE,
+                        help=f"Leads claimed per batch (default: {BRANCHE_PENDING_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=OPENAI_CONCURRENCY,
+                        help=f"Concurrent GPT requests (default: {OPENAI_CONCURRENCY})")
+    parser.add_argument("--max-batches", type=int, default=0, help="Stop after this many batches (default: until empty)")
+    parser.add_argument("--enqueue-missing", action="store_true", help="First queue all leads without a sector")
+    args = parser.parse_args()
+
+    totals = {"claimed": 0, "classified": 0, "failed": 0, "gave_up": 0, "dropped": 0}
+    batches = 0
+
+    try:
+        with get_conn() as conn:
+            run_migrations(conn)
+
+            if args.enqueue_missing:
+                logging.info("Queued %d leads without sector", enqueue_missing_branchen(conn))
+
+            logging.info("=== BRANCHE WORKER: %d leads pending ===", pending_count(conn))
+
+            while not args.max_batches or batches < args.max_batches:
+                stats = process_branche_pending(conn, limit=args.batch_size, max_workers=args.workers)
+                if not stats["claimed"]:
+                    break
+                batches += 1
+                for key in totals:
+                    totals[key] += stats[key]
+                # Nothing got through (e.g. OpenAI down): leave the rest for the next run
+                if stats["failed"] and not stats["classified"]:
+                    logging.warning("No lead classified in this batch, stopping until next run")
+                    break
+
+            remaining = pending_count(conn)
+
+    except Exception as exc:
+        logging.error("Worker error: %s", exc)
+        sys.exit(1)
+
+    logging.info("=== BRANCHE WORKER: Completed ===")
+    logging.info("  Batches: %d", batches)
+    logging.info("  Classified: %d", totals["classified"])
+    logging.info("  Retry later: %d", totals["failed"])
+    logging.info("  Gave up (Sonstige): %d", totals["gave_up"])
+    logging.info("  Dropped: %d", totals["dropped"])
+    logging.info("  Still pending: %d", remaining)
+
+
+if __name__ == "__main__":
+    main()
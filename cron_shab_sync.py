@@ -1,13 +1,18 @@
 #!/usr/bin/env python3
 """
 Standalone cron script for daily SHAB sync.
+Syncs yesterday plus any days missed since the last completed sync
+(tracked in shab_sync_state); an interrupted day resumes at its last page.
 Run directly: python cron_shab_sync.py
+              python cron_shab_sync.py --defer-classification
+              python cron_shab_sync.py --replay   (from the local archive, no API calls)
 No HTTP timeout issues!
 """
 
 import os
 import sys
 import logging
+import argparse
 from datetime import date, timedelta
 
 # Setup logging
@@ -21,130 +26,70 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from routes.zevix import (
     get_conn,
-    fetch_shab_neueintragungen,
-    ai_branche,
-    ensure_leads_table,
-    RECHTSFORMEN,
 )
+from routes.migrations import run_migrations
+from routes.shab import prune_http_cache
+from routes.shab_archive import prune_archive
+from routes.shab_ingest import BRANCHE_DEFER, STAT_KEYS
+from routes.shab_sync import catchup_dates, sync_shab_date
 
 
 def main():
-    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    parser = argparse.ArgumentParser(description="Daily SHAB sync")
+    parser.add_argument("--defer-classification", action="store_true",
+                        help="Don't call GPT; queue unclassified leads for branche_worker.py")
+    parser.add_argument("--replay", action="store_true", help="Re-ingest from the local SHAB archive instead of the API")
+    args = parser.parse_args()
 
-    logging.info("=== CRON: Starting daily SHAB sync for %s ===", yesterday)
-
-    # Fetch from SHAB API
-    try:
-        publications = fetch_shab_neueintragungen(yesterday, yesterday)
-        logging.info("SHAB API: Fetched %d entries", len(publications) if publications else 0)
-    except Exception as exc:
-        logging.error("SHAB API error: %s", exc)
-        sys.exit(1)
-
-    if not publications:
-        logging.info("No new entries for %s", yesterday)
-        return
-
-    inserted = 0
-    updated = 0
-    errors = 0
+    yesterday = date.today() - timedelta(days=1)
+    totals = dict.fromkeys(STAT_KEYS, 0)
+    failed = []
 
+    # Stream SHAB pages straight into the ingestion engine, one tracked day at a time
     try:
         with get_conn() as conn:
-            with conn.cursor() as cur:
-                ensure_leads_table(cur)
-                conn.commit()
-
-                for i, pub in enumerate(publications):
-                    uid = ""
-                    try:
-                        meta = pub.get("meta", {})
-                        content = pub.get("content", {})
-                        commons = content.get("commonsNew", {}) or content.get("commonsActual", {})
-                        company = commons.get("company", {})
-                        address = company.get("address", {})
-
-                        uid = company.get("uid") or ""
-                        if not uid:
-                            continue
-
-                        firma = company.get("name") or ""
-                        rechtsform_code = company.get("legalForm") or ""
-                        rechtsform = RECHTSFORMEN.get(str(rechtsform_code), str(rechtsform_code))
-
-                        strasse = address.get("street") or ""
-                        hausnummer = address.get("houseNumber") or ""
-                        plz = str(address.get("swissZipCode") or "")
-                        ort = address.get("town") or ""
-                        sitz = company.get("seat") or ort
-
-                        cantons = meta.get("cantons") or []
-                        kanton = cantons[0] if cantons else ""
-
-                        zweck = commons.get("purpose") or ""
-
-                        pub_date_raw = meta.get("publicationDate") or ""
-                        pub_date = pub_date_raw[:10] if pub_date_raw else None
-
-                        # GPT Classification - with error handling
-                        branche = ""
-                        if zweck:
-                            try:
-                                logging.info("  [%d/%d] Classifying: %s", i + 1, len(publications), firma[:50])
-                                branche = ai_branche(zweck)
-                                logging.info("    → Branche: %s", branche)
-                            except Exception as gpt_err:
-                                logging.warning("    → GPT error: %s", gpt_err)
-                                branche = ""
-
-                        cur.execute(
-                            """
-                            INSERT INTO leads
-                                (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                                 sitz, kanton, zweck, branche_ai, publikation_datum)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (uid) DO UPDATE SET
-                                firma = EXCLUDED.firma,
-                                rechtsform = EXCLUDED.rechtsform,
-                                strasse = EXCLUDED.strasse,
-                                hausnummer = EXCLUDED.hausnummer,
-                                plz = EXCLUDED.plz,
-                                ort = EXCLUDED.ort,
-                                sitz = EXCLUDED.sitz,
-                                kanton = EXCLUDED.kanton,
-                                zweck = EXCLUDED.zweck,
-                                branche_ai = EXCLUDED.branche_ai,
-                                publikation_datum = EXCLUDED.publikation_datum
-                            RETURNING (xmax = 0) AS inserted
-                            """,
-                            (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                             sitz, kanton, zweck, branche, pub_date)
-                        )
-
-                        row = cur.fetchone()
-                        if row and row.get("inserted"):
-                            inserted += 1
-                        else:
-                            updated += 1
-
-                        conn.commit()
-
-                    except Exception as exc:
-                        logging.warning("Error processing entry %s: %s", uid or "unknown", exc)
-                        errors += 1
-                        conn.rollback()
-                        continue
+            run_migrations(conn)
+
+            # Every day since the last completed one (normally just yesterday)
+            dates = [yesterday.isoformat()] if args.replay else catchup_dates(conn, yesterday)
+            logging.info("=== CRON: Starting daily SHAB sync for %s ===", ", ".join(dates) or "nothing")
+
+            for sync_date in dates:
+                try:
+                    stats = sync_shab_date(
+                        conn, sync_date, log_prefix=f"CRON {sync_date}", replay=args.replay,
+                        defer_classification=args.defer_classification or BRANCHE_DEFER,
+                    )
+                except Exception as exc:
+                    logging.error("Sync error for %s: %s", sync_date, exc)
+                    failed.append(sync_date)
+                    continue
+                if not stats["total"]:
+                    logging.info("No new entries for %s", sync_date)
+                for key in totals:
+                    totals[key] += stats[key]
 
     except Exception as exc:
-        logging.error("Database error: %s", exc)
+        logging.error("Sync error: %s", exc)
         sys.exit(1)
 
+    if not args.replay:
+        prune_archive()
+        prune_http_cache()
+
     logging.info("=== CRON: Completed ===")
-    logging.info("  Date: %s", yesterday)
-    logging.info("  Total: %d", len(publications))
-    logging.info("  Inserted: %d", inserted)
-    logging.info("  Updated: %d", updated)
-    logging.info("  Errors: %d", errors)
+    logging.info("  Dates: %s", ", ".join(dates))
+    logging.info("  Total: %d", totals["total"])
+    logging.info("  Inserted: %d", totals["inserted"])
+    logging.info("  Updated: %d", totals["updated"])
+    logging.info("  Skipped (unchanged): %d", totals["skipped_unchanged"])
+    logging.info("  Duplicates dropped: %d", totals["duplicates"])
+    logging.info("  Errors: %d", totals["errors"])
+    logging.info("  Sector pending: %d", totals["branche_pending"])
+
+    if failed:
+        logging.error("  Failed dates (resumed next run): %s", ", ".join(failed))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,687 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import openai
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+from routes.branche_model import model_branche
+
+# ---------------------------- GPT CONFIG ----------------------------
+OPENAI_MODEL = "gpt-4.1-mini"
+
+BRANCHEN = [
+    "Autohandel", "IT / Software", "Gastronomie", "Transport / Logistik",
+    "Baugewerbe", "Immobilien", "Handel", "Industrie", "Dienstleistungen",
+    "Gesundheitswesen", "Sonstige",
+]
+
+BRANCHE_SYSTEM_PROMPT = (
+    "Du bist Handelsregister-Analyst. Ordne Firmen anhand ihres Zwecks EINER Branche zu. "
+    "Antworte NUR mit einem Branchentitel (1-3 Wörter).\n\n"
+    "ERLAUBTE BRANCHEN:\n"
+    + ", ".join(BRANCHEN)
+)
+
+BRANCHE_BATCH_SYSTEM_PROMPT = (
+    "Du bist Handelsregister-Analyst. Du erhältst eine nummerierte Liste von Firmenzwecken. "
+    "Ordne JEDE Firma anhand ihres Zwecks EINER Branche zu.\n\n"
+    "ERLAUBTE BRANCHEN:\n"
+    + ", ".join(BRANCHEN)
+    + "\n\nAntworte NUR mit einem JSON-Objekt der Form {\"branchen\": [...]}: "
+    "genau ein Branchentitel pro Eintrag, in derselben Reihenfolge wie die Liste."
+)
+
+# Keyword rules for the local fast path. Specific sectors win over the
+# generic ones (Handel, Industrie, Dienstleistungen), which only count when
+# no specific sector matched.
+BRANCHE_RULES = {
+    "Autohandel": [
+        r"autohandel", r"automobil", r"handel mit (motor)?fahrzeugen", r"occasions?(fahrzeug|wagen|en\b)",
+        r"autogarage", r"\bgarage\b", r"carrosserie", r"autowerkstatt", r"autoverkauf",
+    ],
+    "IT / Software": [
+        r"software", r"informatik", r"informationstechnolog", r"\bit-", r"\bedv\b", r"applikation",
+        r"webentwicklung", r"webdesign", r"programmier", r"cloud", r"cyber", r"hardware",
+    ],
+    "Gastronomie": [
+        r"restaurant", r"gastronomie", r"gastgewerb", r"pizzeria", r"\bbars?\b", r"\bcaf[eé]",
+        r"take-?away", r"catering", r"imbiss", r"bistro", r"\bhotels?\b", r"kebab",
+    ],
+    "Transport / Logistik": [
+        r"transport", r"logistik", r"spedition", r"kurier", r"umz[üu]ge?", r"z[üu]gel",
+        r"\btaxi", r"g[üu]terverkehr", r"fracht", r"lieferdienst",
+    ],
+    "Baugewerbe": [
+        r"baugewerbe", r"bauunternehm", r"hochbau", r"tiefbau", r"bauarbeiten", r"bauleistungen",
+        r"gipser", r"maler(arbeiten|ei|gesch[äa]ft)", r"sanit[äa]r", r"elektroinstallation",
+        r"dachdecker", r"bedachung", r"schreinerei", r"plattenleger", r"fassadenbau", r"renovation",
+    ],
+    "Immobilien": [
+        r"liegenschaft", r"immobilie", r"grundst[üu]ck", r"grundeigentum", r"stockwerkeigentum",
+        r"vermietung von wohn",
+    ],
+    "Gesundheitswesen": [
+        r"arztpraxis", r"medizin", r"physiotherap", r"\bpflege", r"spitex", r"zahnarzt", r"zahnmedizin",
+        r"apotheke", r"psychotherap", r"gesundheitswesen", r"\bpraxis f[üu]r",
+    ],
+    "Handel": [
+        r"handel mit", r"\bhandel\b", r"detailhandel", r"grosshandel", r"\bimport", r"\bexport",
+        r"vertrieb", r"online-?shop", r"onlinehandel", r"e-commerce",
+    ],
+    "Industrie": [
+        r"herstellung", r"fabrikation", r"produktion von", r"maschinenbau", r"fertigung", r"industrie",
+    ],
+    "Dienstleistungen": [
+        r"dienstleistung", r"beratung", r"consulting", r"treuhand", r"buchhaltung", r"reinigung",
+        r"personalvermittlung", r"personalverleih", r"coaching", r"marketing",
+    ],
+}
+GENERIC_BRANCHEN = {"Handel", "Industrie", "Dienstleistungen"}
+
+# Standard clause of Swiss articles ("Die Gesellschaft kann Zweigniederlassungen
+# errichten, Grundeigentum erwerben, ..."): everything from here on is boilerplate
+PURPOSE_BOILERPLATE = re.compile(r"\b(?:die gesellschaft|sie)\s+kann\b")
+
+COMPILED_BRANCHE_RULES = {
+    branche: [re.compile(pattern) for pattern in patterns]
+    for branche, patterns in BRANCHE_RULES.items()
+}
+
+# Budget of the OpenAI account tier; shared by all threads of this process
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "8"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+# Hard deadline per request (seconds); slow calls count as failures
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "20"))
+# After this many consecutive failed calls, stop calling OpenAI for the cooldown
+OPENAI_BREAKER_THRESHOLD = int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5"))
+OPENAI_BREAKER_COOLDOWN = float(os.getenv("OPENAI_BREAKER_COOLDOWN", "120"))
+# Purpose texts per GPT request (1 = one request per text)
+OPENAI_BATCH_SIZE = int(os.getenv("OPENAI_BATCH_SIZE", "20"))
+
+OPENAI_USAGE = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+OPENAI_USAGE_LOCK = Lock()
+
+# In-process LRU in front of the branche_cache table (zweck hash -> branche)
+BRANCHE_LRU_SIZE = int(os.getenv("BRANCHE_LRU_SIZE", "10000"))
+BRANCHE_LRU = OrderedDict()
+BRANCHE_LRU_LOCK = Lock()
+
+BRANCHE_STATS = {"memory_hits": 0, "rule_hits": 0, "db_hits": 0, "model_hits": 0, "misses": 0}
+BRANCHE_STATS_LOCK = Lock()
+
+
+# ---------------------------- RATE LIMITING ----------------------------
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate_per_minute``."""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = max(1, rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def acquire(self, amount: int = 1) -> None:
+        """Block until ``amount`` tokens are available, then take them."""
+        amount = min(max(1, amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for OpenAI calls."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, tokens: int) -> None:
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+
+OPENAI_RATE_LIMITER = RateLimiter(OPENAI_RPM, OPENAI_TPM)
+
+
+# ---------------------------- CIRCUIT BREAKER ----------------------------
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling OpenAI while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops outgoing calls for ``cooldown`` seconds after ``threshold`` consecutive failures.
+
+    Once the cooldown has passed, a single trial call is let through; it
+    closes the circuit on success or re-opens it for another cooldown.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.lock = Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.failures < self.threshold:
+                return True
+            now = time.monotonic()
+            if now < self.open_until:
+                return False
+            # Trial call; everyone else keeps waiting for its outcome
+            self.open_until = now + self.cooldown
+            return True
+
+    def record_success(self) -> None:
+        with self.lock:
+            if self.failures >= self.threshold:
+                logging.info("OpenAI circuit breaker closed again")
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.open_until = time.monotonic() + self.cooldown
+                if self.failures == self.threshold:
+                    logging.warning(
+                        "OpenAI circuit breaker open after %d failures, pausing GPT calls for %.0fs",
+                        self.failures, self.cooldown,
+                    )
+
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.failures >= self.threshold and time.monotonic() < self.open_until
+
+
+OPENAI_BREAKER = CircuitBreaker(OPENAI_BREAKER_THRESHOLD, OPENAI_BREAKER_COOLDOWN)
+
+_OPENAI_CLIENT = None
+_OPENAI_CLIENT_KEY = None
+_OPENAI_CLIENT_LOCK = Lock()
+
+
+def get_openai_client() -> openai.OpenAI:
+    """Process-wide OpenAI client, so HTTP connections are reused across calls and threads.
+
+    Retries are handled in chat_completion so they go through the rate limiter.
+    """
+    global _OPENAI_CLIENT, _OPENAI_CLIENT_KEY
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY fehlt")
+    with _OPENAI_CLIENT_LOCK:
+        if _OPENAI_CLIENT is None or _OPENAI_CLIENT_KEY != api_key:
+            _OPENAI_CLIENT = openai.OpenAI(api_key=api_key, max_retries=0, timeout=OPENAI_TIMEOUT)
+            _OPENAI_CLIENT_KEY = api_key
+        return _OPENAI_CLIENT
+
+
+def estimate_tokens(zweck: str, max_tokens: int = 20) -> int:
+    """Rough token estimate (~3 chars per token for German) incl. prompt and completion."""
+    return (len(BRANCHE_SYSTEM_PROMPT) + len(zweck[:500])) // 3 + max_tokens
+
+
+def retry_delay(attempt: int, exc: Exception | None = None) -> float:
+    """Exponential backoff with jitter, honouring a Retry-After header if present."""
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+
+# ---------------------------- GPT BRANCHE ----------------------------
+def count_openai_usage(response) -> None:
+    usage = getattr(response, "usage", None)
+    with OPENAI_USAGE_LOCK:
+        OPENAI_USAGE["requests"] += 1
+        if usage is not None:
+            OPENAI_USAGE["prompt_tokens"] += usage.prompt_tokens or 0
+            OPENAI_USAGE["completion_tokens"] += usage.completion_tokens or 0
+
+
+def openai_usage() -> dict:
+    with OPENAI_USAGE_LOCK:
+        return dict(OPENAI_USAGE)
+
+
+def chat_completion(messages: list[dict], max_tokens: int, estimated_tokens: int, **kwargs) -> str:
+    """One chat completion under the RPM/TPM budget, retrying 429s with backoff.
+
+    Returns the message content. Raises if the API is unavailable or fails,
+    and CircuitOpenError without calling out while the breaker is open.
+    """
+    client = get_openai_client()
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        if not OPENAI_BREAKER.allow():
+            raise CircuitOpenError("OpenAI circuit breaker open")
+        OPENAI_RATE_LIMITER.acquire(estimated_tokens)
+        try:
+            response = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0,
+                **kwargs,
+            )
+        except openai.RateLimitError as exc:
+            if attempt == OPENAI_MAX_RETRIES:
+                OPENAI_BREAKER.record_failure()
+                raise
+            delay = retry_delay(attempt, exc)
+            logging.info("GPT rate limit (429), retry %d in %.1fs", attempt + 1, delay)
+            time.sleep(delay)
+            continue
+        except (openai.APIConnectionError, openai.InternalServerError):
+            # Timeouts, network errors and 5xx: the service is unhealthy
+            OPENAI_BREAKER.record_failure()
+            raise
+        OPENAI_BREAKER.record_success()
+        count_openai_usage(response)
+        return response.choices[0].message.content.strip()
+
+
+def classify_branche(zweck: str) -> str | None:
+    """Classify one purpose text via GPT. Raises if the API is unavailable or fails.
+
+    The answer is validated against BRANCHEN like in the batch call; a label
+    outside the list comes back as None.
+    """
+    if not zweck:
+        return "Sonstige"
+    answer = chat_completion(
+        [
+            {"role": "system", "content": BRANCHE_SYSTEM_PROMPT},
+            {"role": "user", "content": zweck[:500]},
+        ],
+        max_tokens=20,
+        estimated_tokens=estimate_tokens(zweck),
+    )
+    branche = canonical_branche(answer)
+    if branche is None:
+        logging.warning("GPT-Antwort ist keine bekannte Branche: %s", answer[:100])
+    return branche
+
+
+def classify_branche_batch(zwecke: list[str]) -> list[str | None]:
+    """Classify several purpose texts in one request (numbered list in, JSON out).
+
+    Each answer is validated against BRANCHEN; positions with a missing or
+    invalid answer come back as None so the caller can retry them one by one.
+    Raises if the request itself fails.
+    """
+    numbered = "\n".join(f"{i}. {' '.join(zweck[:500].split())}" for i, zweck in enumerate(zwecke, start=1))
+    content = chat_completion(
+        [
+            {"role": "system", "content": BRANCHE_BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": numbered},
+        ],
+        max_tokens=12 * len(zwecke) + 20,
+        estimated_tokens=(len(BRANCHE_BATCH_SYSTEM_PROMPT) + len(numbered)) // 3 + 12 * len(zwecke) + 20,
+        response_format={"type": "json_object"},
+    )
+
+    try:
+        answers = json.loads(content).get("branchen")
+    except (ValueError, AttributeError):
+        answers = None
+    if not isinstance(answers, list):
+        logging.warning("GPT Batch-Antwort nicht lesbar: %s", content[:200])
+        return [None] * len(zwecke)
+    if len(answers) != len(zwecke):
+        logging.warning("GPT Batch-Antwort hat %d statt %d Einträge", len(answers), len(zwecke))
+
+    results = []
+    for i in range(len(zwecke)):
+        answer = answers[i] if i < len(answers) else None
+        results.append(canonical_branche(answer) if isinstance(answer, str) else None)
+    return results
+
+
+def ai_branche(zweck: str) -> str:
+    """Classify a company's industry sector based on its purpose text.
+
+    Uses the keyword rules when they are unambiguous, otherwise OpenAI GPT.
+    """
+    branche = rule_branche(zweck)
+    if branche:
+        count_branche_stat("rule_hits")
+        return branche
+    branche = model_branche(zweck)
+    if branche:
+        count_branche_stat("model_hits")
+        return branche
+    try:
+        return classify_branche(zweck) or "Sonstige"
+    except CircuitOpenError:
+        return "Sonstige"
+    except Exception as exc:
+        logging.warning("GPT Branchenklassifizierung fehlgeschlagen: %s", exc)
+        return "Sonstige"
+
+
+def _classify_chunk(zwecke: list[str], log_prefix: str) -> list[str]:
+    """Batched request for a chunk, with per-item fallback for unusable answers."""
+    if len(zwecke) == 1:
+        answers = [None]
+    else:
+        try:
+            answers = classify_branche_batch(zwecke)
+        except CircuitOpenError:
+            return [""] * len(zwecke)
+        except Exception as exc:
+            logging.warning("%s: Batch-Klassifizierung fehlgeschlagen, einzeln weiter: %s", log_prefix, exc)
+            answers = [None] * len(zwecke)
+
+    results = []
+    for zweck, answer in zip(zwecke, answers):
+        if answer is None:
+            try:
+                answer = classify_branche(zweck) or ""
+            except CircuitOpenError:
+                answer = ""
+            except Exception as exc:
+                logging.warning("%s: Klassifizierung fehlgeschlagen: %s", log_prefix, exc)
+                answer = ""
+        results.append(answer)
+    return results
+
+
+def classify_many(
+    zwecke: list[str],
+    max_workers: int = OPENAI_CONCURRENCY,
+    batch_size: int = OPENAI_BATCH_SIZE,
+    log_prefix: str = "GPT",
+) -> list[str]:
+    """Classify many purpose texts concurrently. Results are in input order.
+
+    Identical texts are only sent once; unique texts are grouped into
+    batched prompts of ``batch_size``. Items that fail come back as "".
+    """
+    unique = list(dict.fromkeys(zwecke))
+    results = {}
+    if not unique:
+        return []
+
+    batch_size = max(1, batch_size)
+    chunks = [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="branche") as executor:
+        futures = {executor.submit(_classify_chunk, chunk, log_prefix): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                answers = future.result()
+            except Exception as exc:
+                logging.warning("%s: Klassifizierung fehlgeschlagen: %s", log_prefix, exc)
+                answers = [""] * len(chunk)
+            results.update(zip(chunk, answers))
+            done += len(chunk)
+            logging.info("%s: classified %d/%d", log_prefix, done, len(unique))
+
+    unclassified = sum(1 for branche in results.values() if not branche)
+    if unclassified and OPENAI_BREAKER.is_open():
+        logging.warning("%s: %d purposes left unclassified, OpenAI circuit breaker is open", log_prefix, unclassified)
+    return [results[zweck] for zweck in zwecke]
+
+
+# ---------------------------- RULE-BASED FAST PATH ----------------------------
+def main_purpose(zweck: str) -> str:
+    """The purpose text without the standard "Die Gesellschaft kann ..." clause."""
+    text = zweck.lower()
+    match = PURPOSE_BOILERPLATE.search(text)
+    if match and match.start() > 0:
+        return text[:match.start()]
+    return text
+
+
+def rule_scores(zweck: str) -> dict[str, int]:
+    """Number of matching keyword rules per sector, in the main purpose clause only."""
+    text = main_purpose(zweck)[:500]
+    scores = {}
+    for branche, patterns in COMPILED_BRANCHE_RULES.items():
+        hits = sum(1 for pattern in patterns if pattern.search(text))
+        if hits:
+            scores[branche] = hits
+    return scores
+
+
+def rule_branche(zweck: str) -> str | None:
+    """Deterministic keyword classification. Returns None when ambiguous.
+
+    A sector is returned only if it is the single specific sector matched, or
+    clearly ahead (at least two more hits) of every other specific sector.
+    Generic sectors are used only when no specific sector matched at all.
+    """
+    if not zweck:
+        return None
+    scores = rule_scores(zweck)
+    specific = {b: n for b, n in scores.items() if b not in GENERIC_BRANCHEN}
+    candidates = specific or scores
+    if not candidates:
+        return None
+
+    ranked = sorted(candidates.items(), key=lambda item: item[1], reverse=True)
+    if len(ranked) == 1:
+        return ranked[0][0]
+    if ranked[0][1] >= ranked[1][1] + 2:
+        return ranked[0][0]
+    return None
+
+
+def normalize_branche_label(label: str | None) -> str:
+    return " ".join(str(label or "").replace("/", " / ").lower().split())
+
+
+CANONICAL_BRANCHEN = {normalize_branche_label(branche): branche for branche in BRANCHEN}
+
+
+def canonical_branche(label: str | None) -> str | None:
+    """Map a free-form answer (e.g. "IT/Software") onto the allowed list, or None."""
+    return CANONICAL_BRANCHEN.get(normalize_branche_label(label))
+
+
+def evaluate_rules(samples) -> dict:
+    """Compare rule_branche against existing labels.
+
+    ``samples`` is an iterable of (zweck, label). Returns coverage (share of
+    samples the rules decide), precision (share of decided samples that agree
+    with the label) and a per-sector breakdown.
+    """
+    total = 0
+    decided = 0
+    correct = 0
+    per_branche = {}
+    for zweck, label in samples:
+        total += 1
+        predicted = rule_branche(zweck)
+        if predicted is None:
+            continue
+        decided += 1
+        entry = per_branche.setdefault(predicted, {"decided": 0, "correct": 0})
+        entry["decided"] += 1
+        if normalize_branche_label(predicted) == normalize_branche_label(label):
+            correct += 1
+            entry["correct"] += 1
+
+    for entry in per_branche.values():
+        entry["precision"] = round(entry["correct"] / entry["decided"], 3)
+
+    return {
+        "total": total,
+        "decided": decided,
+        "correct": correct,
+        "coverage": round(decided / total, 3) if total else 0.0,
+        "precision": round(correct / decided, 3) if decided else 0.0,
+        "per_branche": per_branche,
+    }
+
+
+# ---------------------------- BRANCHE CACHE ----------------------------
+def normalize_zweck(zweck: str) -> str:
+    """Normalize a purpose text the way it is sent to GPT (first 500 chars)."""
+    text = " ".join(zweck[:500].lower().split())
+    return text.strip(" .;,")
+
+
+def zweck_hash(zweck: str) -> str:
+    return hashlib.sha256(normalize_zweck(zweck).encode()).hexdigest()
+
+
+def ensure_branche_cache_table(cur) -> None:
+    """Create the branche_cache table if it doesn't exist yet."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS branche_cache (
+            zweck_hash CHAR(64) PRIMARY KEY,
+            branche VARCHAR(100) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_lru_branche(key: str) -> str | None:
+    with BRANCHE_LRU_LOCK:
+        branche = BRANCHE_LRU.get(key)
+        if branche is not None:
+            BRANCHE_LRU.move_to_end(key)
+        return branche
+
+
+def set_lru_branche(key: str, branche: str) -> None:
+    with BRANCHE_LRU_LOCK:
+        BRANCHE_LRU[key] = branche
+        BRANCHE_LRU.move_to_end(key)
+        while len(BRANCHE_LRU) > BRANCHE_LRU_SIZE:
+            BRANCHE_LRU.popitem(last=False)
+
+
+def count_branche_stat(key: str, amount: int = 1) -> None:
+    if amount:
+        with BRANCHE_STATS_LOCK:
+            BRANCHE_STATS[key] += amount
+
+
+def branche_cache_stats() -> dict:
+    with BRANCHE_STATS_LOCK:
+        stats = dict(BRANCHE_STATS)
+    with BRANCHE_LRU_LOCK:
+        stats["lru_entries"] = len(BRANCHE_LRU)
+    stats["lru_size"] = BRANCHE_LRU_SIZE
+    resolved = stats["memory_hits"] + stats["rule_hits"] + stats["db_hits"] + stats["model_hits"]
+    lookups = resolved + stats["misses"]
+    stats["hit_rate"] = round(resolved / lookups, 3) if lookups else 0.0
+    stats["openai"] = openai_usage()
+    stats["openai_circuit_open"] = OPENAI_BREAKER.is_open()
+    return stats
+
+
+def classify_cached(
+    conn,
+    zwecke: list[str],
+    log_prefix: str = "GPT",
+    use_gpt: bool = True,
+    max_workers: int = OPENAI_CONCURRENCY,
+) -> list[str]:
+    """Classify purpose texts: LRU, keyword rules, branche_cache and the local model before GPT.
+
+    Only successful GPT answers are written back to branche_cache. The
+    lookup transaction is committed before any API call is made. With
+    ``use_gpt=False`` purposes that can't be resolved locally come back as "".
+    """
+    keys = {}
+    for zweck in zwecke:
+        if zweck:
+            keys.setdefault(zweck_hash(zweck), zweck)
+
+    found = {}
+    for key in keys:
+        branche = get_lru_branche(key)
+        if branche is not None:
+            found[key] = branche
+    count_branche_stat("memory_hits", len(found))
+
+    rule_hits = 0
+    for key, zweck in keys.items():
+        if key not in found:
+            branche = rule_branche(zweck)
+            if branche:
+                found[key] = branche
+                rule_hits += 1
+    count_branche_stat("rule_hits", rule_hits)
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT zweck_hash, branche FROM branche_cache WHERE zweck_hash = ANY(%s)",
+                (missing,),
+            )
+            rows = cur.fetchall()
+        conn.commit()
+        for row in rows:
+            found[row["zweck_hash"]] = row["branche"]
+            set_lru_branche(row["zweck_hash"], row["branche"])
+        count_branche_stat("db_hits", len(rows))
+
+    model_hits = 0
+    for key, zweck in keys.items():
+        if key not in found:
+            branche = model_branche(zweck)
+            if branche:
+                found[key] = branche
+                model_hits += 1
+    count_branche_stat("model_hits", model_hits)
+
+    missing = [key for key in keys if key not in found]
+    count_branche_stat("misses", len(missing))
+    if missing and not use_gpt:
+        logging.info(
+            "%s: %d/%d purposes resolved locally, %d deferred",
+            log_prefix, len(keys) - len(missing), len(keys), len(missing),
+        )
+        found.update(dict.fromkeys(missing, ""))
+    elif missing:
+        logging.info(
+            "%s: %d/%d purposes resolved locally (%d by rules, %d by model), %d sent to GPT",
+            log_prefix, len(keys) - len(missing), len(keys), rule_hits, model_hits, len(missing),
+        )
+        answers = classify_many([keys[key] for key in missing], max_workers=max_workers, log_prefix=log_prefix)
+        found.update(zip(missing, answers))
+        fresh = {key: branche for key, branche in zip(missing, answers) if branche}
+        if fresh:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    """
+                    INSERT INTO branche_cache (zweck_hash, branche)
+                    VALUES (%s, %s)
+                    ON CONFLICT (zweck_hash) DO NOTHING
+                    """,
+                    list(fresh.items()),
+                )
+            conn.commit()
+            for key, branche in fresh.items():
+                set_lru_branche(key, branche)
+
+    return [found[zweck_hash(zweck)] if zweck else "Sonstige" for zweck in zwecke]
@@ -0,0 +1,147 @@
+"""
+Local sector classifier trained from GPT-labelled leads.
+
+TF-IDF vectors over the purpose text and one L2-normalized centroid per
+sector (nearest-centroid by cosine similarity). The model is a single
+compressed .npz file; train it with ``python train_branche_model.py``.
+"""
+
+import os
+import re
+import logging
+import numpy as np
+from collections import Counter
+from threading import Lock
+
+BRANCHE_MODEL_PATH = os.getenv(
+    "BRANCHE_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "branche_model.npz"),
+)
+# A prediction is used only if it is close enough to its centroid and clearly
+# ahead of the runner-up; everything else falls through to GPT.
+BRANCHE_MODEL_MIN_SCORE = float(os.getenv("BRANCHE_MODEL_MIN_SCORE", "0.35"))
+BRANCHE_MODEL_MIN_MARGIN = float(os.getenv("BRANCHE_MODEL_MIN_MARGIN", "0.10"))
+
+TOKEN_RE = re.compile(r"[a-zäöüàâçéèêëîïôûù]{3,}")
+
+_MODEL = None
+_MODEL_LOADED = False
+_MODEL_LOCK = Lock()
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text[:500].lower())
+
+
+class BrancheModel:
+    def __init__(self, vocab: list[str], idf: np.ndarray, centroids: np.ndarray, labels: list[str]):
+        self.vocab = {token: i for i, token in enumerate(vocab)}
+        self.idf = idf.astype(np.float32)
+        self.centroids = centroids.astype(np.float32)
+        self.labels = list(labels)
+
+    # ---------------------------- FEATURES ----------------------------
+    def _features(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """Sparse L2-normalized tf-idf vector as (indices, weights)."""
+        counts = Counter(self.vocab[t] for t in tokenize(text) if t in self.vocab)
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        weights = (1.0 + np.log(weights)) * self.idf[indices]
+        norm = np.linalg.norm(weights)
+        return indices, weights / norm if norm else weights
+
+    def scores(self, text: str) -> np.ndarray:
+        """Cosine similarity of the text to every sector centroid."""
+        indices, weights = self._features(text)
+        if not len(indices):
+            return np.zeros(len(self.labels), dtype=np.float32)
+        return self.centroids[:, indices] @ weights
+
+    def predict(self, text: str) -> tuple[str, float, float]:
+        """Returns (label, score, margin to the runner-up)."""
+        scores = self.scores(text)
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        second = float(scores[order[1]]) if len(order) > 1 else 0.0
+        return self.labels[order[0]], best, best - second
+
+    def predict_confident(self, text: str) -> str | None:
+        label, score, margin = self.predict(text)
+        if score >= BRANCHE_MODEL_MIN_SCORE and margin >= BRANCHE_MODEL_MIN_MARGIN:
+            return label
+        return None
+
+    # ---------------------------- TRAIN / PERSIST ----------------------------
+    @classmethod
+    def train(cls, samples: list[tuple[str, str]], max_features: int = 20000, min_df: int = 2) -> "BrancheModel":
+        """Fit vocabulary, idf weights and one centroid per label from (text, label) pairs."""
+        docs = [set(tokenize(text)) for text, _ in samples]
+        df = Counter(token for doc in docs for token in doc)
+        vocab = [token for token, n in df.most_common(max_features) if n >= min_df]
+        n_docs = len(samples)
+        idf = np.array([np.log((1 + n_docs) / (1 + df[token])) + 1.0 for token in vocab], dtype=np.float32)
+        labels = sorted({label for _, label in samples})
+        label_index = {label: i for i, label in enumerate(labels)}
+
+        model = cls(vocab, idf, np.zeros((len(labels), len(vocab)), dtype=np.float32), labels)
+        for text, label in samples:
+            indices, weights = model._features(text)
+            model.centroids[label_index[label], indices] += weights
+
+        norms = np.linalg.norm(model.centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        model.centroids /= norms
+        return model
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        vocab = sorted(self.vocab, key=self.vocab.get)
+        np.savez_compressed(
+            path,
+            vocab=np.array(vocab),
+            idf=self.idf,
+            centroids=self.centroids.astype(np.float16),
+            labels=np.array(self.labels),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BrancheModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["vocab"].tolist(),
+                data["idf"],
+                data["centroids"],
+                data["labels"].tolist(),
+            )
+
+
+def get_branche_model() -> BrancheModel | None:
+    """Load the model from BRANCHE_MODEL_PATH once per process; None if not available."""
+    global _MODEL, _MODEL_LOADED
+    if _MODEL_LOADED:
+        return _MODEL
+    with _MODEL_LOCK:
+        if not _MODEL_LOADED:
+            if os.path.exists(BRANCHE_MODEL_PATH):
+                try:
+                    _MODEL = BrancheModel.load(BRANCHE_MODEL_PATH)
+                    logging.info(
+                        "Branchen-Modell geladen: %s (%d Labels, %d Features)",
+                        BRANCHE_MODEL_PATH, len(_MODEL.labels), len(_MODEL.vocab),
+                    )
+                except Exception as exc:
+                    logging.warning("Branchen-Modell konnte nicht geladen werden: %s", exc)
+            _MODEL_LOADED = True
+    return _MODEL
+
+
+def model_branche(zweck: str) -> str | None:
+    """High-confidence local prediction, or None if no model / not confident."""
+    if not zweck:
+        return None
+    model = get_branche_model()
+    if model is None:
+        return None
+    return model.predict_confident(zweck)
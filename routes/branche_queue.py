@@ -0,0 +1,193 @@
+"""
+Deferred sector classification.
+
+Leads that were stored without a sector (GPT failed, the circuit breaker was
+open, or the sync ran with deferred classification) are queued in
+``branche_pending``. ``python branche_worker.py`` drains the queue in
+batches and fills in ``leads.branche_ai``. Several workers can run at once:
+claimed rows are leased with ``FOR UPDATE SKIP LOCKED``.
+"""
+
+import os
+import logging
+
+from routes.branche import OPENAI_CONCURRENCY, classify_cached
+
+BRANCHE_PENDING_BATCH_SIZE = int(os.getenv("BRANCHE_PENDING_BATCH_SIZE", "200"))
+# Give up (and store "Sonstige") after this many failed attempts
+BRANCHE_PENDING_MAX_ATTEMPTS = int(os.getenv("BRANCHE_PENDING_MAX_ATTEMPTS", "5"))
+# A claimed row is hidden from other workers for this long (seconds)
+BRANCHE_PENDING_LEASE = int(os.getenv("BRANCHE_PENDING_LEASE", "600"))
+# Base delay before a failed row is retried; doubles per attempt (seconds)
+BRANCHE_PENDING_RETRY_DELAY = int(os.getenv("BRANCHE_PENDING_RETRY_DELAY", "300"))
+
+
+def ensure_branche_pending_table(cur) -> None:
+    """Create the branche_pending work queue if it doesn't exist yet."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS branche_pending (
+            uid VARCHAR(20) PRIMARY KEY,
+            enqueued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_branche_pending_next ON branche_pending(next_attempt_at)")
+
+
+def enqueue_branche_pending(cur, uids: list[str]) -> int:
+    """Queue leads for (re)classification. Already queued uids are left alone."""
+    if not uids:
+        return 0
+    cur.execute(
+        """
+        INSERT INTO branche_pending (uid)
+        SELECT DISTINCT unnest(%s::text[])
+        ON CONFLICT (uid) DO NOTHING
+        """,
+        (list(uids),),
+    )
+    return cur.rowcount
+
+
+def enqueue_missing_branchen(conn) -> int:
+    """Queue every stored lead that has no sector yet (one-off catch-up)."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO branche_pending (uid)
+            SELECT uid FROM leads
+            WHERE coalesce(branche_ai, '') = '' AND uid IS NOT NULL
+            ON CONFLICT (uid) DO NOTHING
+            """
+        )
+        queued = cur.rowcount
+    conn.commit()
+    return queued
+
+
+def claim_branche_pending(conn, limit: int = BRANCHE_PENDING_BATCH_SIZE) -> list[dict]:
+    """Lease up to ``limit`` due queue rows and return them with the lead's purpose text.
+
+    The lease is committed right away, so no transaction stays open while
+    GPT is called. If the worker dies, the rows become due again once the
+    lease expires.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE branche_pending p
+            SET attempts = p.attempts + 1,
+                next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE p.uid IN (
+                SELECT uid FROM branche_pending
+                WHERE next_attempt_at <= CURRENT_TIMESTAMP
+                ORDER BY next_attempt_at, enqueued_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING p.uid, p.attempts
+            """,
+            (BRANCHE_PENDING_LEASE, limit),
+        )
+        claimed = {row["uid"]: row["attempts"] for row in cur.fetchall()}
+        leads = []
+        if claimed:
+            cur.execute(
+                "SELECT uid, zweck, branche_ai FROM leads WHERE uid = ANY(%s)",
+                (list(claimed),),
+            )
+            leads = cur.fetchall()
+    conn.commit()
+
+    by_uid = {row["uid"]: row for row in leads}
+    return [
+        {
+            "uid": uid,
+            "attempts": attempts,
+            "zweck": by_uid[uid]["zweck"] if uid in by_uid else None,
+            "branche_ai": by_uid[uid]["branche_ai"] if uid in by_uid else None,
+        }
+        for uid, attempts in claimed.items()
+    ]
+
+
+def process_branche_pending(conn, limit: int = BRANCHE_PENDING_BATCH_SIZE,
+                            max_workers: int = OPENAI_CONCURRENCY) -> dict:
+    """Claim one batch, classify it and write the sectors back.
+
+    Returns counts: claimed, classified, failed (retried later), gave_up, dropped.
+    """
+    stats = {"claimed": 0, "classified": 0, "failed": 0, "gave_up": 0, "dropped": 0}
+    items = claim_branche_pending(conn, limit)
+    stats["claimed"] = len(items)
+    if not items:
+        return stats
+
+    # Lead deleted or already classified in the meantime: nothing to do
+    done = [item["uid"] for item in items if item["zweck"] is None or item["branche_ai"]]
+    todo = [item for item in items if item["zweck"] is not None and not item["branche_ai"]]
+    stats["dropped"] = len(done)
+
+    branchen = classify_cached(
+        conn, [item["zweck"] for item in todo],
+        log_prefix="BRANCHE-QUEUE", max_workers=max_workers,
+    )
+
+    updates = []
+    failed = []
+    for item, branche in zip(todo, branchen):
+        if branche:
+            updates.append((item["uid"], branche))
+        elif item["attempts"] >= BRANCHE_PENDING_MAX_ATTEMPTS:
+            updates.append((item["uid"], "Sonstige"))
+            stats["gave_up"] += 1
+        else:
+            failed.append(item)
+    stats["classified"] = len(updates) - stats["gave_up"]
+    stats["failed"] = len(failed)
+
+    with conn.cursor() as cur:
+        if updates:
+            cur.execute(
+                """
+                UPDATE leads l
+                SET branche_ai = v.branche
+                FROM unnest(%s::text[], %s::text[]) AS v(uid, branche)
+                WHERE l.uid = v.uid
+                """,
+                ([uid for uid, _ in updates], [branche for _, branche in updates]),
+            )
+        finished = done + [uid for uid, _ in updates]
+        if finished:
+            cur.execute("DELETE FROM branche_pending WHERE uid = ANY(%s)", (finished,))
+        for item in failed:
+            cur.execute(
+                """
+                UPDATE branche_pending
+                SET last_error = %s,
+                    next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+                WHERE uid = %s
+                """,
+                (
+                    "classification failed",
+                    BRANCHE_PENDING_RETRY_DELAY * 2 ** (item["attempts"] - 1),
+                    item["uid"],
+                ),
+            )
+    conn.commit()
+
+    logging.info(
+        "BRANCHE-QUEUE: %d claimed -> %d classified, %d retry later, %d gave up, %d dropped",
+        stats["claimed"], stats["classified"], stats["failed"], stats["gave_up"], stats["dropped"],
+    )
+    return stats
+
+
+def pending_count(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) AS count FROM branche_pending")
+        count = cur.fetchone()["count"]
+    conn.commit()
+    return count
@@ -0,0 +1,111 @@
+"""
+Versioned schema migrations.
+
+``schema_migrations`` records every applied version. ``run_migrations``
+applies the pending ones in order; it runs once at app and worker boot and
+from the cron scripts, so request handlers don't run any DDL. Several
+gunicorn workers boot at the same time, so the run is serialized with an
+advisory lock.
+
+Add a migration by appending ``(version, name, func(cur))`` to MIGRATIONS.
+Never change or reorder one that has been deployed. Statements that can't
+run inside a transaction (``CREATE INDEX CONCURRENTLY``) go into
+CONCURRENT_MIGRATIONS instead, with versions from the same sequence: they
+run one by one in autocommit mode after the others, by whichever process
+gets to them first, and a failure is logged and retried on the next boot.
+"""
+
+import logging
+
+from routes.branche import ensure_branche_cache_table
+from routes.branche_queue import ensure_branche_pending_table
+from routes.shab import ensure_leads_keyset_index, ensure_leads_table
+from routes.shab_sync import ensure_sync_state_table
+from routes.sync_jobs import ensure_sync_jobs_table
+from routes.usage import ensure_export_quota_function, ensure_usage_exports_table, ensure_used_ids_version
+
+# Arbitrary key for pg_advisory_xact_lock, shared by all processes of the app
+MIGRATION_LOCK_KEY = 7261001
+
+# The first versions create the tables the code used to create on demand;
+# they use IF NOT EXISTS, so existing databases pass through them unchanged.
+MIGRATIONS = [
+    (1, "leads", ensure_leads_table),
+    (2, "branche_cache", ensure_branche_cache_table),
+    (3, "branche_pending", ensure_branche_pending_table),
+    (4, "shab_sync_state", ensure_sync_state_table),
+    (5, "sync_jobs", ensure_sync_jobs_table),
+    (6, "usage_exports", ensure_usage_exports_table),
+    (7, "export_leads_quota", ensure_export_quota_function),
+    (8, "used_ids_version", ensure_used_ids_version),
+]
+
+CONCURRENT_MIGRATIONS = [
+    (9, "leads_keyset_index", ensure_leads_keyset_index),
+]
+
+
+def run_migrations(conn) -> list[int]:
+    """Apply all pending migrations in one transaction. Returns the applied versions."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {row["version"] for row in cur.fetchall()}
+
+        applied = []
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            logging.info("Schema migration %d (%s)", version, name)
+            migrate(cur)
+            cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            applied.append(version)
+    conn.commit()
+
+    for version, name, migrate in CONCURRENT_MIGRATIONS:
+        if version not in done and _run_concurrent_migration(conn, version, name, migrate):
+            applied.append(version)
+
+    if applied:
+        logging.info("Schema: applied migrations %s", ", ".join(map(str, applied)))
+    return applied
+
+
+def _run_concurrent_migration(conn, version: int, name: str, migrate) -> bool:
+    """Apply one migration outside a transaction. Returns False if skipped or failed.
+
+    A session advisory lock per version keeps other booting processes from
+    running it at the same time; they skip it instead of waiting.
+    """
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s, %s) AS locked", (MIGRATION_LOCK_KEY, version))
+            if not cur.fetchone()["locked"]:
+                logging.info("Schema migration %d (%s) is running in another process", version, name)
+                return False
+            try:
+                cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cur.fetchone():
+                    return False
+                logging.info("Schema migration %d (%s), outside a transaction", version, name)
+                migrate(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                    (version, name),
+                )
+                return True
+            except Exception as exc:
+                logging.warning("Schema migration %d (%s) failed, retried on next boot: %s", version, name, exc)
+                return False
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s, %s)", (MIGRATION_LOCK_KEY, version))
+    finally:
+        conn.autocommit = False
@@ -0,0 +1,444 @@
+import os
+import gzip
+import json
+import queue
+import hashlib
+import logging
+import time
+import threading
+import requests as http_requests
+from contextlib import closing
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from routes.shab_archive import archive_shab_page
+
+# ---------------------------- SHAB CONFIG ----------------------------
+ALLE_KANTONE = [
+    "AG", "AI", "AR", "BE", "BL", "BS", "FR", "GE", "GL", "GR",
+    "JU", "LU", "NE", "NW", "OW", "SG", "SH", "SO", "SZ", "TG",
+    "TI", "UR", "VD", "VS", "ZG", "ZH",
+]
+
+RECHTSFORMEN = {
+    "0101": "Einzelunternehmen",
+    "0103": "Kollektivgesellschaft",
+    "0104": "Kommanditgesellschaft",
+    "0106": "Aktiengesellschaft",
+    "0107": "GmbH",
+    "0108": "Genossenschaft",
+    "0109": "Verein",
+    "0110": "Stiftung",
+    "0113": "Zweigniederlassung",
+}
+
+SHAB_API_URL = "https://www.shab.ch/api/v1/publications"
+SHAB_PAGE_SIZE = int(os.getenv("SHAB_PAGE_SIZE", "500"))
+
+# HTTP client: (connect, read) timeouts in seconds and retries with
+# exponential backoff on connection errors, 429 and 5xx
+SHAB_CONNECT_TIMEOUT = float(os.getenv("SHAB_CONNECT_TIMEOUT", "10"))
+SHAB_READ_TIMEOUT = float(os.getenv("SHAB_READ_TIMEOUT", "60"))
+SHAB_MAX_RETRIES = int(os.getenv("SHAB_MAX_RETRIES", "4"))
+SHAB_POOL_SIZE = int(os.getenv("SHAB_POOL_SIZE", "16"))
+# Sharded mode: split the cantons into this many groups fetched in parallel
+# (1 = one request for all cantons)
+SHAB_CANTON_SHARDS = int(os.getenv("SHAB_CANTON_SHARDS", "1"))
+SHAB_SHARD_WORKERS = int(os.getenv("SHAB_SHARD_WORKERS", "4"))
+# On-disk cache for conditional requests (ETag / Last-Modified), shared by
+# all processes on the host; empty (the default) disables it
+SHAB_HTTP_CACHE_DIR = os.getenv("SHAB_HTTP_CACHE_DIR", "")
+# Cached pages not refreshed for this many days are removed by prune_http_cache
+SHAB_HTTP_CACHE_MAX_AGE_DAYS = float(os.getenv("SHAB_HTTP_CACHE_MAX_AGE_DAYS", "7"))
+
+_SHAB_SESSION = None
+_SHAB_SESSION_LOCK = threading.Lock()
+
+
+# ---------------------------- HELPERS ----------------------------
+def parse_date_to_iso(date_str: str) -> str:
+    """Convert various date formats to ISO 8601 (YYYY-MM-DD).
+
+    Supports:
+    - MM/DD/YYYY (American: 02/25/2026)
+    - DD/MM/YYYY (European: 25/02/2026)
+    - YYYY-MM-DD (ISO: 2026-02-25)
+    - DD.MM.YYYY (Swiss/German: 25.02.2026)
+    """
+    if not date_str:
+        return date_str
+
+    formats = [
+        "%Y-%m-%d",  # ISO - already correct
+        "%m/%d/%Y",  # American
+        "%d/%m/%Y",  # European
+        "%d.%m.%Y",  # Swiss/German
+    ]
+    for fmt in formats:
+        try:
+            return datetime.strptime(date_str.strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+
+    logging.warning("Could not parse date format: %s, using as-is", date_str)
+    return date_str
+
+
+def parse_cantons(value) -> list[str] | None:
+    """Canton selection from a request ("ZH,BE" or ["zh", "be"]), or None for all.
+
+    Raises ValueError for unknown canton codes.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    cantons = sorted({str(code).strip().upper() for code in value if str(code).strip()})
+    unknown = [code for code in cantons if code not in ALLE_KANTONE]
+    if unknown:
+        raise ValueError(f"Unknown canton(s): {', '.join(unknown)}")
+    if not cantons or cantons == ALLE_KANTONE:
+        return None
+    return cantons
+
+
+def canton_groups(cantons: list[str], shards: int) -> list[list[str]]:
+    """Split cantons into ``shards`` interleaved groups (spreads the large cantons)."""
+    shards = max(1, min(shards, len(cantons)))
+    return [cantons[i::shards] for i in range(shards)]
+
+
+# ---------------------------- HTTP CLIENT ----------------------------
+def get_shab_session() -> http_requests.Session:
+    """Shared keep-alive session for the SHAB API (one connection pool per process)."""
+    global _SHAB_SESSION
+    with _SHAB_SESSION_LOCK:
+        if _SHAB_SESSION is None:
+            retry = Retry(
+                total=SHAB_MAX_RETRIES,
+                backoff_factor=1.0,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset({"GET"}),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SHAB_POOL_SIZE, max_retries=retry)
+            session = http_requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Accept": "application/json",
+                "Accept-Language": "de",
+            })
+            _SHAB_SESSION = session
+        return _SHAB_SESSION
+
+
+def _http_cache_path(key: tuple) -> str:
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(SHAB_HTTP_CACHE_DIR, digest[:2], digest)
+
+
+def _write_atomic(path: str, payload: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _http_cache_get(key: tuple) -> dict | None:
+    """Validators (etag, last_modified, sha256) of a cached page, or None."""
+    if not SHAB_HTTP_CACHE_DIR:
+        return None
+    try:
+        with open(f"{_http_cache_path(key)}.json", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _http_cache_body(key: tuple, sha256: str) -> dict | None:
+    """The cached body of a page, or None when missing or not matching ``sha256``."""
+    try:
+        with open(f"{_http_cache_path(key)}.json.gz", "rb") as fh:
+            body = gzip.decompress(fh.read())
+    except OSError:
+        return None
+    if hashlib.sha256(body).hexdigest() != sha256:
+        return None
+    return json.loads(body)
+
+
+def _http_cache_set(key: tuple, etag: str | None, last_modified: str | None, body: bytes) -> None:
+    """Store a page body on disk with its validators. Errors are logged and ignored."""
+    if not SHAB_HTTP_CACHE_DIR:
+        return
+    path = _http_cache_path(key)
+    validators = {"etag": etag, "last_modified": last_modified, "sha256": hashlib.sha256(body).hexdigest()}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Body first: validators never point at a body that isn't there yet
+        _write_atomic(f"{path}.json.gz", gzip.compress(body, compresslevel=1))
+        _write_atomic(f"{path}.json", json.dumps(validators).encode("utf-8"))
+    except OSError as exc:
+        logging.warning("SHAB HTTP cache: could not write %s: %s", path, exc)
+
+
+def prune_http_cache() -> int:
+    """Remove cached pages older than SHAB_HTTP_CACHE_MAX_AGE_DAYS. Returns the number of files removed."""
+    if not SHAB_HTTP_CACHE_DIR or SHAB_HTTP_CACHE_MAX_AGE_DAYS <= 0 or not os.path.isdir(SHAB_HTTP_CACHE_DIR):
+        return 0
+    cutoff = time.time() - SHAB_HTTP_CACHE_MAX_AGE_DAYS * 86400
+    removed = 0
+    for root, _, files in os.walk(SHAB_HTTP_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    if removed:
+        logging.info("SHAB HTTP cache: removed %d files older than %g days", removed, SHAB_HTTP_CACHE_MAX_AGE_DAYS)
+    return removed
+
+
+def fetch_shab_page(datum_von: str, datum_bis: str, page: int, page_size: int = SHAB_PAGE_SIZE,
+                    cantons: list[str] | None = None) -> dict:
+    """Fetch one raw result page of HR01 publications from the SHAB.ch API.
+
+    Sends If-None-Match / If-Modified-Since when the page was fetched before
+    (validators and body are kept on disk in SHAB_HTTP_CACHE_DIR) and returns
+    the cached body on 304 Not Modified.
+    """
+    params = {
+        "allowRubricSelection": "true",
+        "cantons": ",".join(cantons or ALLE_KANTONE),
+        "includeContent": "true",
+        "pageRequest.page": str(page),
+        "pageRequest.size": str(page_size),
+        "publicationStates": "PUBLISHED",
+        "publicationDate.start": datum_von,
+        "publicationDate.end": datum_bis,
+        "subRubrics": "HR01",
+    }
+
+    key = tuple(sorted(params.items()))
+    cached = _http_cache_get(key)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    session = get_shab_session()
+    timeout = (SHAB_CONNECT_TIMEOUT, SHAB_READ_TIMEOUT)
+    resp = session.get(SHAB_API_URL, params=params, headers=headers, timeout=timeout)
+    if resp.status_code == 304 and cached:
+        data = _http_cache_body(key, cached.get("sha256") or "")
+        if data is not None:
+            logging.info("SHAB API: page %d for %s to %s not modified (304)", page, datum_von, datum_bis)
+            return data
+        # Cached body lost or replaced by another process: fetch it unconditionally
+        resp = session.get(SHAB_API_URL, params=params, timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if etag or last_modified:
+        _http_cache_set(key, etag, last_modified, resp.content)
+    return data
+
+
+def iter_shab_pages(datum_von: str, datum_bis: str, page_size: int = SHAB_PAGE_SIZE, start_page: int = 0,
+                    cantons: list[str] | None = None):
+    """Walk all result pages for a date range, yielding (page_number, publications).
+
+    Stops at the first short page or once the reported total is reached.
+    Errors are raised, so a failed page is never silently dropped. Every
+    fetched page is also written to the on-disk archive (see shab_archive).
+    """
+    datum_von = parse_date_to_iso(datum_von)
+    datum_bis = parse_date_to_iso(datum_bis)
+    shard = "-".join(cantons) if cantons else ""
+
+    page = start_page
+    fetched = start_page * page_size
+    while True:
+        data = fetch_shab_page(datum_von, datum_bis, page, page_size, cantons)
+        results = data.get("content") or []
+        fetched += len(results)
+        total = data.get("total")
+        logging.info(
+            "SHAB API: page %d, %d HR01 entries fetched for %s to %s%s (%d/%s)",
+            page, len(results), datum_von, datum_bis, f" [{shard}]" if shard else "",
+            fetched, total if total is not None else "?",
+        )
+        if results:
+            archive_shab_page(datum_von, datum_bis, page, results, shard=shard)
+            yield page, results
+
+        if len(results) < page_size:
+            break
+        if isinstance(total, int) and fetched >= total:
+            break
+        page += 1
+
+
+def _iter_threaded(iterables: list, depth: int, max_workers: int | None = None, name: str = "shab-worker"):
+    """Consume each iterable in its own background thread and yield their items as they arrive.
+
+    At most ``max_workers`` iterables run at a time and up to ``depth``
+    items are kept ready. The first exception of any producer is re-raised
+    in the consumer; closing the generator stops all producers.
+    """
+    items = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    slots = threading.Semaphore(max(1, max_workers or len(iterables)))
+    done = object()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer(iterable):
+        with slots:
+            try:
+                for item in iterable:
+                    if not put((item, None)):
+                        return
+            except BaseException as exc:
+                put((done, exc))
+                return
+        put((done, None))
+
+    threads = [
+        threading.Thread(target=producer, args=(iterable,), name=f"{name}-{i}", daemon=True)
+        for i, iterable in enumerate(iterables)
+    ]
+    for thread in threads:
+        thread.start()
+
+    finished = 0
+    try:
+        while finished < len(threads):
+            item, exc = items.get()
+            if item is done:
+                if exc is not None:
+                    raise exc
+                finished += 1
+                continue
+            yield item
+    finally:
+        stop.set()
+
+
+def prefetch(iterable, depth: int = 1):
+    """Consume ``iterable`` in a background thread, keeping up to ``depth`` items ready.
+
+    Lets the caller process page N while page N+1 is still downloading.
+    Exceptions from the producer are re-raised in the consumer.
+    """
+    return _iter_threaded([iterable], depth, name="shab-prefetch")
+
+
+def iter_sharded_pages(datum_von: str, datum_bis: str, cantons: list[str] | None = None,
+                       shards: int = SHAB_CANTON_SHARDS, page_size: int = SHAB_PAGE_SIZE,
+                       max_workers: int = SHAB_SHARD_WORKERS):
+    """Fetch a date range per canton group in parallel, yielding merged (seq, publications).
+
+    Each group is paged independently (and retried by the HTTP session on its
+    own). A publication listed for several cantons shows up in more than one
+    group; repeats of an already yielded publication id are dropped. Different
+    publications of the same company are all passed on, so ingest keeps the
+    newest one per uid (collapse_rows within a page, the upsert's newer-only
+    condition across pages). Pages are numbered in the order they arrive, so
+    there is no page cursor to resume from. Errors from any group are raised.
+    """
+    groups = canton_groups(cantons or ALLE_KANTONE, shards)
+    if len(groups) == 1:
+        yield from iter_shab_pages(datum_von, datum_bis, page_size, cantons=cantons)
+        return
+
+    pages = _iter_threaded(
+        [iter_shab_pages(datum_von, datum_bis, page_size, cantons=group) for group in groups],
+        depth=max(1, max_workers) * 2, max_workers=max_workers, name="shab-shard",
+    )
+    seen = set()
+    duplicates = 0
+    seq = 0
+    with closing(pages):
+        for _, results in pages:
+            merged = []
+            for pub in results:
+                pub_id = (pub.get("meta") or {}).get("id")
+                if pub_id and pub_id in seen:
+                    duplicates += 1
+                    continue
+                seen.add(pub_id)
+                merged.append(pub)
+            if merged:
+                yield seq, merged
+                seq += 1
+
+    logging.info(
+        "SHAB API: %d canton groups merged for %s to %s, %d duplicate publications dropped",
+        len(groups), datum_von, datum_bis, duplicates,
+    )
+
+
+def ensure_leads_table(cur) -> None:
+    """Create the leads table if it doesn't exist yet."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS leads (
+            id SERIAL PRIMARY KEY,
+            uid VARCHAR(20) UNIQUE,
+            firma VARCHAR(500),
+            rechtsform VARCHAR(100),
+            strasse VARCHAR(200),
+            hausnummer VARCHAR(20),
+            plz VARCHAR(10),
+            ort VARCHAR(100),
+            sitz VARCHAR(100),
+            kanton VARCHAR(5),
+            zweck TEXT,
+            branche_ai VARCHAR(100),
+            publikation_datum DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_leads_datum ON leads(publikation_datum)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_leads_kanton ON leads(kanton)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_leads_branche ON leads(branche_ai)")
+
+
+# Sort key of the leads list; leads without a date sort after all dated ones
+LEADS_SORT_DATE = "COALESCE(publikation_datum, '-infinity'::date)"
+
+
+def ensure_leads_keyset_index(cur) -> None:
+    """Index matching the leads list order, for keyset pagination in /zevix/leads.
+
+    Built CONCURRENTLY so leads stays writable, which needs an autocommit
+    connection. An invalid index left by an interrupted build is rebuilt.
+    """
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass('idx_leads_sort')")
+    row = cur.fetchone()
+    if row and row["indisvalid"]:
+        return
+    if row:
+        cur.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_leads_sort")
+    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_sort ON leads(({LEADS_SORT_DATE}) DESC, id DESC)")
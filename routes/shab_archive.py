@@ -0,0 +1,150 @@
+"""
+On-disk archive of raw SHAB API results.
+
+Every fetched page is stored as gzip-compressed JSONL, partitioned by
+publication day::
+
+    <SHAB_ARCHIVE_DIR>/2026/02/2026-02-25/2026-02-25_2026-02-25_p00000.jsonl.gz
+
+Archiving is off unless SHAB_ARCHIVE_DIR is set. A full re-sync of a day
+clears that day first (``clear_archived_days``), so replays never mix in
+pages of an older fetch; ``prune_archive`` removes days older than
+SHAB_ARCHIVE_RETENTION_DAYS. ``iter_archived_pages`` replays a date range
+from disk in the same (page, publications) shape as ``iter_shab_pages``, so
+it can be fed straight into ``ingest_pages``.
+"""
+
+import os
+import gzip
+import json
+import shutil
+import logging
+from datetime import date, timedelta
+
+# Archive root; empty (the default) disables archiving
+SHAB_ARCHIVE_DIR = os.getenv("SHAB_ARCHIVE_DIR", "")
+# Publication days kept by prune_archive (0 = keep everything)
+SHAB_ARCHIVE_RETENTION_DAYS = int(os.getenv("SHAB_ARCHIVE_RETENTION_DAYS", "90"))
+
+
+def archive_day_dir(day: str) -> str:
+    return os.path.join(SHAB_ARCHIVE_DIR, day[:4], day[5:7], day)
+
+
+def clear_archived_days(datum_von: str, datum_bis: str) -> None:
+    """Remove the archived pages of a date range before it is fetched again in full."""
+    if not SHAB_ARCHIVE_DIR:
+        return
+    current = date.fromisoformat(datum_von)
+    end = date.fromisoformat(datum_bis)
+    while current <= end:
+        directory = archive_day_dir(current.isoformat())
+        if os.path.isdir(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+        current += timedelta(days=1)
+
+
+def prune_archive(today: date | None = None) -> int:
+    """Remove archived days older than SHAB_ARCHIVE_RETENTION_DAYS. Returns the number removed."""
+    if not SHAB_ARCHIVE_DIR or SHAB_ARCHIVE_RETENTION_DAYS <= 0 or not os.path.isdir(SHAB_ARCHIVE_DIR):
+        return 0
+    cutoff = ((today or date.today()) - timedelta(days=SHAB_ARCHIVE_RETENTION_DAYS)).isoformat()
+    removed = 0
+    for root, dirs, _ in os.walk(SHAB_ARCHIVE_DIR):
+        for name in list(dirs):
+            # Day directories are named YYYY-MM-DD; year and month directories are walked into
+            if len(name) == 10 and name[4] == "-" and name < cutoff:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+                dirs.remove(name)
+                removed += 1
+    if removed:
+        logging.info("SHAB archive: removed %d days older than %s", removed, cutoff)
+    return removed
+
+
+def archive_shab_page(datum_von: str, datum_bis: str, page: int, publications: list, shard: str = "") -> None:
+    """Write one fetched page to the archive, split by publication day.
+
+    Files are written to a temp name and renamed, so readers never see a
+    partial file. Errors are logged and otherwise ignored. ``shard`` names
+    the canton group of a sharded fetch, so its pages don't overwrite those
+    of other groups.
+    """
+    if not SHAB_ARCHIVE_DIR or not publications:
+        return
+
+    by_day = {}
+    for pub in publications:
+        day = ((pub.get("meta") or {}).get("publicationDate") or "")[:10] or datum_von
+        by_day.setdefault(day, []).append(pub)
+
+    for day, pubs in by_day.items():
+        directory = archive_day_dir(day)
+        name = f"{datum_von}_{datum_bis}_{shard}" if shard else f"{datum_von}_{datum_bis}"
+        path = os.path.join(directory, f"{name}_p{page:05d}.jsonl.gz")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as fh:
+                for pub in pubs:
+                    fh.write(json.dumps(pub, ensure_ascii=False, separators=(",", ":")))
+                    fh.write("\n")
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logging.warning("SHAB archive: could not write %s: %s", path, exc)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _publication_key(pub: dict) -> tuple:
+    meta = pub.get("meta") or {}
+    if meta.get("id"):
+        return ("id", meta["id"])
+    content = pub.get("content") or {}
+    commons = content.get("commonsNew") or content.get("commonsActual") or {}
+    uid = (commons.get("company") or {}).get("uid")
+    return ("uid", uid, meta.get("publicationDate"))
+
+
+def iter_archived_publications(datum_von: str, datum_bis: str):
+    """Yield archived publications for a date range, day by day, without duplicates.
+
+    The same publication can be archived more than once when overlapping
+    ranges were fetched; only the first copy is returned.
+    """
+    current = date.fromisoformat(datum_von)
+    end = date.fromisoformat(datum_bis)
+    while current <= end:
+        directory = archive_day_dir(current.isoformat())
+        seen = set()
+        files = sorted(f for f in os.listdir(directory) if f.endswith(".jsonl.gz")) if os.path.isdir(directory) else []
+        if not files:
+            logging.info("SHAB archive: nothing archived for %s", current)
+        for name in files:
+            with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    if not line.strip():
+                        continue
+                    pub = json.loads(line)
+                    key = _publication_key(pub)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield pub
+        current += timedelta(days=1)
+
+
+def iter_archived_pages(datum_von: str, datum_bis: str, page_size: int = 500):
+    """Replay archived publications as (page_number, publications), like ``iter_shab_pages``."""
+    page = 0
+    batch = []
+    for pub in iter_archived_publications(datum_von, datum_bis):
+        batch.append(pub)
+        if len(batch) >= page_size:
+            yield page, batch
+            page += 1
+            batch = []
+    if batch:
+        yield page, batch
@@ -0,0 +1,380 @@
+"""
+Shared SHAB ingestion engine.
+
+All sync entry points (web endpoints, cron script, backfill) stream pages of
+raw SHAB publications into ``ingest_pages``. Each page is parsed into
+lead rows, classified and written to ``leads`` in one set-based step:
+COPY into a temporary staging table, then a single
+``INSERT ... SELECT ... ON CONFLICT``. Leads left without a sector are
+queued in ``branche_pending`` for ``branche_worker.py``.
+"""
+
+import os
+import hashlib
+import logging
+from typing import NamedTuple
+
+from routes.branche import classify_cached
+from routes.branche_queue import enqueue_branche_pending
+from routes.shab import RECHTSFORMEN
+
+# Only resolve sectors locally (cache, rules, model) during sync and leave
+# GPT to the branche_pending worker
+BRANCHE_DEFER = os.getenv("BRANCHE_DEFER", "false").lower() in ("1", "true", "yes")
+
+
+class LeadRecord(NamedTuple):
+    """One lead row, field order = ``LEAD_COLUMNS`` (so a record is its own parameter tuple)."""
+    uid: str
+    firma: str
+    rechtsform: str
+    strasse: str
+    hausnummer: str
+    plz: str
+    ort: str
+    sitz: str
+    kanton: str
+    zweck: str
+    branche_ai: str
+    publikation_datum: str | None
+
+
+LEAD_COLUMNS = LeadRecord._fields
+
+# Columns that make up a lead's content fingerprint (branche_ai is derived)
+FINGERPRINT_COLUMNS = tuple(col for col in LEAD_COLUMNS if col not in ("uid", "branche_ai"))
+
+STAT_KEYS = ("total", "inserted", "updated", "skipped_unchanged", "duplicates", "errors", "branche_pending")
+
+_COLUMN_LIST = ", ".join(LEAD_COLUMNS)
+_UPDATE_LIST = ",\n                ".join(f"{col} = EXCLUDED.{col}" for col in LEAD_COLUMNS if col != "uid")
+# Skip no-op updates so unchanged rows don't produce dead tuples / WAL
+_CHANGED_CONDITION = "({}) IS DISTINCT FROM ({})".format(
+    ", ".join(f"leads.{col}" for col in LEAD_COLUMNS if col != "uid"),
+    ", ".join(f"EXCLUDED.{col}" for col in LEAD_COLUMNS if col != "uid"),
+)
+# Last write wins by publication date: an older publication never
+# overwrites a newer one, whatever order the syncs run in
+_NEWER_CONDITION = (
+    "(leads.publikation_datum IS NULL OR EXCLUDED.publikation_datum >= leads.publikation_datum)"
+)
+_FINGERPRINT_SQL = "md5(concat_ws(chr(31), {}))".format(
+    ", ".join(f"coalesce({col}::text, '')" for col in FINGERPRINT_COLUMNS)
+)
+
+
+# ---------------------------- PARSE ----------------------------
+def parse_publication(pub: dict) -> LeadRecord | None:
+    """Turn one raw SHAB publication into a LeadRecord (with an empty branche_ai).
+
+    Normalizes the legal form via RECHTSFORMEN, the PLZ to a string and the
+    publication timestamp to YYYY-MM-DD. Returns None for publications
+    without a company UID.
+    """
+    content = pub.get("content") or {}
+    commons = content.get("commonsNew") or content.get("commonsActual") or {}
+    company = commons.get("company") or {}
+
+    uid = company.get("uid")
+    if not uid:
+        return None
+
+    meta = pub.get("meta") or {}
+    address = company.get("address") or {}
+    rechtsform_code = str(company.get("legalForm") or "")
+    ort = address.get("town") or ""
+    cantons = meta.get("cantons")
+    pub_date = meta.get("publicationDate")
+    plz = address.get("swissZipCode")
+
+    return LeadRecord(
+        uid,
+        company.get("name") or "",
+        RECHTSFORMEN.get(rechtsform_code, rechtsform_code),
+        address.get("street") or "",
+        address.get("houseNumber") or "",
+        str(plz) if plz else "",
+        ort,
+        company.get("seat") or ort,
+        cantons[0] if cantons else "",
+        commons.get("purpose") or "",
+        "",
+        pub_date[:10] if pub_date else None,
+    )
+
+
+def parse_publications(publications: list, log_prefix: str = "SHAB") -> tuple[list[LeadRecord], int]:
+    """Parse a page of publications. Returns (rows, parse_errors)."""
+    rows = []
+    errors = 0
+    for pub in publications:
+        try:
+            row = parse_publication(pub)
+        except Exception as exc:
+            logging.warning("%s: Fehler beim Parsen eines SHAB-Eintrags: %s", log_prefix, exc)
+            errors += 1
+            continue
+        if row:
+            rows.append(row)
+    return rows, errors
+
+
+def collapse_rows(rows: list[LeadRecord]) -> tuple[list[LeadRecord], int]:
+    """Keep one row per uid: the newest by publikation_datum (later in the page on ties).
+
+    Returns (rows, duplicates_dropped). Runs before classification so
+    repeated publications of a company cost neither a GPT call nor a rewrite.
+    """
+    newest = {}
+    for row in rows:
+        current = newest.get(row.uid)
+        if current is None or (row.publikation_datum or "") >= (current.publikation_datum or ""):
+            newest[row.uid] = row
+    return list(newest.values()), len(rows) - len(newest)
+
+
+# ---------------------------- FINGERPRINT ----------------------------
+def row_fingerprint(row: LeadRecord) -> str:
+    """Content fingerprint of a lead row; matches _FINGERPRINT_SQL on the leads table."""
+    values = (str(getattr(row, col) or "") for col in FINGERPRINT_COLUMNS)
+    return hashlib.md5(chr(31).join(values).encode()).hexdigest()
+
+
+def load_existing_leads(conn, uids: list[str]) -> dict:
+    """Fetch fingerprint, purpose hash, sector and publication date of stored leads in one query."""
+    if not uids:
+        return {}
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT uid, {_FINGERPRINT_SQL} AS fingerprint,
+                   md5(coalesce(zweck, '')) AS zweck_md5, branche_ai, publikation_datum
+            FROM leads
+            WHERE uid = ANY(%s)
+            """,
+            (uids,),
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return {row["uid"]: row for row in rows}
+
+
+def drop_unchanged_rows(conn, rows: list[LeadRecord]) -> tuple[list[LeadRecord], int]:
+    """Remove rows whose stored content is identical and already classified.
+
+    Rows older than the stored publication are removed too, as the upsert
+    would reject them (_NEWER_CONDITION). Changed rows with an unchanged
+    purpose text reuse the stored sector, so they don't need a GPT call
+    either. Returns (rows_to_write, skipped).
+    """
+    existing = load_existing_leads(conn, list({row.uid for row in rows}))
+    if not existing:
+        return rows, 0
+
+    pending = []
+    skipped = 0
+    for row in rows:
+        known = existing.get(row.uid)
+        stored_date = known.get("publikation_datum") if known else None
+        if stored_date and (row.publikation_datum or "") < stored_date.isoformat():
+            skipped += 1
+            continue
+        if known and known.get("branche_ai"):
+            if known["fingerprint"] == row_fingerprint(row):
+                skipped += 1
+                continue
+            if known["zweck_md5"] == hashlib.md5(row.zweck.encode()).hexdigest():
+                row = row._replace(branche_ai=known["branche_ai"])
+        pending.append(row)
+    return pending, skipped
+
+
+# ---------------------------- CLASSIFY ----------------------------
+def classify_rows(conn, rows: list[LeadRecord], log_prefix: str = "SHAB", use_gpt: bool = True) -> list[LeadRecord]:
+    """Fill ``branche_ai`` for rows that don't have one yet (cache first, then concurrent GPT).
+
+    Returns the rows in the same order. Rows that can't be classified keep
+    an empty ``branche_ai``.
+    """
+    todo = [row.zweck for row in rows if not row.branche_ai]
+    if not todo:
+        return rows
+    branchen = iter(classify_cached(conn, todo, log_prefix=log_prefix, use_gpt=use_gpt))
+    return [row if row.branche_ai else row._replace(branche_ai=next(branchen)) for row in rows]
+
+
+# ---------------------------- UPSERT ----------------------------
+def upsert_leads(cur, rows: list[LeadRecord]) -> tuple[int, int, int]:
+    """Bulk upsert rows into leads. Returns (inserted, updated, unchanged).
+
+    Rows are streamed into a temporary staging table with COPY and merged with
+    one INSERT ... SELECT. If the same uid appears more than once, the last
+    occurrence wins (ON CONFLICT cannot touch a row twice per statement).
+    Rows identical to the stored version, or older than it, are not rewritten.
+    """
+    if not rows:
+        return 0, 0, 0
+
+    cur.execute(
+        """
+        CREATE TEMP TABLE leads_staging (
+            seq INTEGER,
+            uid TEXT,
+            firma TEXT,
+            rechtsform TEXT,
+            strasse TEXT,
+            hausnummer TEXT,
+            plz TEXT,
+            ort TEXT,
+            sitz TEXT,
+            kanton TEXT,
+            zweck TEXT,
+            branche_ai TEXT,
+            publikation_datum DATE
+        ) ON COMMIT DROP
+        """
+    )
+    with cur.copy(f"COPY leads_staging (seq, {_COLUMN_LIST}) FROM STDIN") as copy:
+        for seq, row in enumerate(rows):
+            copy.write_row((seq, *row))
+
+    cur.execute(
+        f"""
+        INSERT INTO leads ({_COLUMN_LIST})
+        SELECT DISTINCT ON (uid) {_COLUMN_LIST}
+        FROM leads_staging
+        ORDER BY uid, seq DESC
+        ON CONFLICT (uid) DO UPDATE SET
+                {_UPDATE_LIST}
+        WHERE {_CHANGED_CONDITION} AND {_NEWER_CONDITION}
+        RETURNING (xmax = 0) AS inserted
+        """
+    )
+    results = cur.fetchall()
+    inserted = sum(1 for r in results if r.get("inserted"))
+    unchanged = len({row.uid for row in rows}) - len(results)
+    return inserted, len(results) - inserted, unchanged
+
+
+def _upsert_leads_row_by_row(conn, rows: list[LeadRecord], log_prefix: str) -> tuple[int, int, int, int]:
+    """Fallback when the bulk statement fails: isolate bad rows with savepoints."""
+    inserted = 0
+    updated = 0
+    unchanged = 0
+    errors = 0
+    placeholders = ", ".join(["%s"] * len(LEAD_COLUMNS))
+    with conn.cursor() as cur:
+        for row in rows:
+            try:
+                with conn.transaction():
+                    cur.execute(
+                        f"""
+                        INSERT INTO leads ({_COLUMN_LIST})
+                        VALUES ({placeholders})
+                        ON CONFLICT (uid) DO UPDATE SET
+                                {_UPDATE_LIST}
+                        WHERE {_CHANGED_CONDITION} AND {_NEWER_CONDITION}
+                        RETURNING (xmax = 0) AS inserted
+                        """,
+                        row,
+                    )
+                    result = cur.fetchone()
+                if result is None:
+                    unchanged += 1
+                elif result.get("inserted"):
+                    inserted += 1
+                else:
+                    updated += 1
+            except Exception as exc:
+                logging.warning("%s: Error upserting %s: %s", log_prefix, row.uid or "unknown", exc)
+                errors += 1
+    conn.commit()
+    return inserted, updated, unchanged, errors
+
+
+# ---------------------------- INGEST ----------------------------
+def new_stats() -> dict:
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    stats["pages"] = 0
+    return stats
+
+
+def ingest_publications(conn, publications: list, log_prefix: str = "SHAB",
+                        defer_classification: bool = BRANCHE_DEFER) -> dict:
+    """Parse, classify and upsert a page of SHAB publications.
+
+    Publications are collapsed to the newest one per uid, and leads whose
+    content is unchanged are skipped, both before classification.
+    Leads stored without a sector are queued in branche_pending; with
+    ``defer_classification`` GPT is not called at all during the sync.
+    Returns a stats dict with total, inserted, updated, skipped_unchanged,
+    duplicates, errors and branche_pending.
+    """
+    stats = new_stats()
+    stats["total"] = len(publications)
+    if not publications:
+        return stats
+
+    rows, parse_errors = parse_publications(publications, log_prefix)
+    stats["errors"] += parse_errors
+
+    rows, duplicates = collapse_rows(rows)
+    stats["duplicates"] += duplicates
+
+    rows, skipped = drop_unchanged_rows(conn, rows)
+    stats["skipped_unchanged"] += skipped
+
+    rows = classify_rows(conn, rows, log_prefix, use_gpt=not defer_classification)
+    pending = [row.uid for row in rows if not row.branche_ai]
+
+    try:
+        with conn.cursor() as cur:
+            inserted, updated, unchanged = upsert_leads(cur, rows)
+            enqueue_branche_pending(cur, pending)
+        conn.commit()
+    except Exception as exc:
+        conn.rollback()
+        logging.warning("%s: Bulk upsert failed (%s), retrying row by row", log_prefix, exc)
+        inserted, updated, unchanged, upsert_errors = _upsert_leads_row_by_row(conn, rows, log_prefix)
+        stats["errors"] += upsert_errors
+        with conn.cursor() as cur:
+            enqueue_branche_pending(cur, pending)
+        conn.commit()
+    stats["branche_pending"] += len(pending)
+
+    stats["inserted"] += inserted
+    stats["updated"] += updated
+    stats["skipped_unchanged"] += unchanged
+
+    logging.info(
+        "%s: %d publications -> +%d inserted, ~%d updated, =%d unchanged, %d duplicates, %d errors, %d sector pending",
+        log_prefix, stats["total"], stats["inserted"], stats["updated"],
+        stats["skipped_unchanged"], stats["duplicates"], stats["errors"], stats["branche_pending"],
+    )
+    return stats
+
+
+def ingest_pages(conn, pages, log_prefix: str = "SHAB", stats: dict | None = None,
+                 defer_classification: bool = BRANCHE_DEFER, on_page=None) -> dict:
+    """Ingest an iterable of (page_number, publications), committing after each page.
+
+    ``pages`` is usually ``prefetch(iter_shab_pages(...))`` so the next page
+    downloads while the current one is upserted. Pass ``stats`` to keep the
+    partial counts if the iteration fails midway. ``on_page(page, page_stats)``
+    is called after each page has been committed.
+    """
+    if stats is None:
+        stats = new_stats()
+
+    for page, publications in pages:
+        page_stats = ingest_publications(
+            conn, publications, log_prefix=f"{log_prefix} p{page}",
+            defer_classification=defer_classification,
+        )
+        for key in STAT_KEYS:
+            stats[key] += page_stats[key]
+        stats["pages"] += 1
+        if on_page is not None:
+            on_page(page, page_stats)
+
+    return stats
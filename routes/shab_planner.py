@@ -0,0 +1,152 @@
+"""
+Adaptive date-range planning for large SHAB backfills.
+
+Quiet days only have a handful of HR01 publications, so instead of one
+request per day the planner groups consecutive days into windows expected
+to fit into a single result page, based on the daily volumes recorded in
+``shab_sync_state``. A window that comes back full is bisected; the
+publications of a window are ingested and recorded per publication day.
+"""
+
+import os
+import logging
+from datetime import date, timedelta
+
+from routes.shab import fetch_shab_page
+from routes.shab_archive import archive_shab_page, clear_archived_days
+from routes.shab_ingest import STAT_KEYS, ingest_publications, new_stats
+from routes.shab_sync import finish_sync_date, record_sync_page, start_sync_date, sync_shab_date
+
+# Window requests use the API's largest page size (the old one-shot sync used 2000)
+SHAB_WINDOW_PAGE_SIZE = int(os.getenv("SHAB_WINDOW_PAGE_SIZE", "2000"))
+# Plan windows to fill at most this share of a page, leaving room for busy days
+SHAB_WINDOW_FILL = float(os.getenv("SHAB_WINDOW_FILL", "0.6"))
+SHAB_MAX_WINDOW_DAYS = int(os.getenv("SHAB_MAX_WINDOW_DAYS", "31"))
+# Assumed publications per day until there is history to learn from
+SHAB_DEFAULT_DAILY_VOLUME = int(os.getenv("SHAB_DEFAULT_DAILY_VOLUME", "200"))
+
+
+# ---------------------------- PLAN ----------------------------
+def estimate_daily_volume(conn) -> dict:
+    """Average publications per weekday (0 = Monday) from completed syncs.
+
+    Weekdays without history fall back to the overall average, then to
+    SHAB_DEFAULT_DAILY_VOLUME.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT EXTRACT(ISODOW FROM sync_date)::int - 1 AS weekday,
+                   AVG(total)::float AS volume,
+                   COUNT(*) AS days
+            FROM shab_sync_state
+            WHERE status = 'done' AND sync_date >= CURRENT_DATE - 365
+            GROUP BY 1
+            """
+        )
+        rows = cur.fetchall()
+    conn.commit()
+
+    learned = {row["weekday"]: row["volume"] for row in rows}
+    days = sum(row["days"] for row in rows)
+    overall = sum(row["volume"] * row["days"] for row in rows) / days if days else SHAB_DEFAULT_DAILY_VOLUME
+    return {weekday: learned.get(weekday, overall) for weekday in range(7)}
+
+
+def plan_windows(days: list[date], volume: dict, page_size: int = SHAB_WINDOW_PAGE_SIZE,
+                 max_days: int = SHAB_MAX_WINDOW_DAYS) -> list[tuple[date, date]]:
+    """Group sorted days into consecutive windows expected to fit into one page.
+
+    A gap (e.g. an already synced day) always ends a window.
+    """
+    budget = page_size * SHAB_WINDOW_FILL
+    windows = []
+    start = end = None
+    expected = 0.0
+    for day in days:
+        day_volume = volume.get(day.weekday(), SHAB_DEFAULT_DAILY_VOLUME)
+        if (
+            start is not None
+            and day == end + timedelta(days=1)
+            and expected + day_volume <= budget
+            and (day - start).days < max_days
+        ):
+            end = day
+            expected += day_volume
+            continue
+        if start is not None:
+            windows.append((start, end))
+        start = end = day
+        expected = day_volume
+    if start is not None:
+        windows.append((start, end))
+    return windows
+
+
+# ---------------------------- SYNC ----------------------------
+def _add_stats(stats: dict, other: dict) -> None:
+    for key in STAT_KEYS:
+        stats[key] += other[key]
+
+
+def sync_window(conn, start: date, end: date, page_size: int = SHAB_WINDOW_PAGE_SIZE,
+                log_prefix: str = "SHAB", stats: dict | None = None) -> dict:
+    """Sync a multi-day window with one request, bisecting it if it doesn't fit into a page.
+
+    Each publication day of the window is ingested and recorded in
+    shab_sync_state on its own. A single day that doesn't fit is paged
+    normally through sync_shab_date. Returns the (accumulated) stats.
+    """
+    if stats is None:
+        stats = new_stats()
+
+    datum_von, datum_bis = start.isoformat(), end.isoformat()
+    if start == end:
+        sync_shab_date(conn, datum_von, log_prefix=f"{log_prefix} {datum_von}", stats=stats)
+        return stats
+
+    data = fetch_shab_page(datum_von, datum_bis, 0, page_size)
+    results = data.get("content") or []
+    total = data.get("total")
+    if len(results) >= page_size or (isinstance(total, int) and total > len(results)):
+        mid = start + timedelta(days=(end - start).days // 2)
+        logging.info(
+            "%s: window %s to %s is full (%s entries), splitting at %s",
+            log_prefix, datum_von, datum_bis, total if total is not None else f">={len(results)}", mid,
+        )
+        sync_window(conn, start, mid, page_size, log_prefix, stats)
+        sync_window(conn, mid + timedelta(days=1), end, page_size, log_prefix, stats)
+        return stats
+
+    logging.info("%s: window %s to %s, %d entries in one request", log_prefix, datum_von, datum_bis, len(results))
+    stats["pages"] += 1
+    clear_archived_days(datum_von, datum_bis)
+    archive_shab_page(datum_von, datum_bis, 0, results)
+
+    by_day = {}
+    for pub in results:
+        day = ((pub.get("meta") or {}).get("publicationDate") or "")[:10]
+        by_day.setdefault(day, []).append(pub)
+
+    current = start
+    while current <= end:
+        day = current.isoformat()
+        start_sync_date(conn, day, restart=True)
+        try:
+            day_stats = ingest_publications(conn, by_day.pop(day, []), log_prefix=f"{log_prefix} {day}")
+        except Exception as exc:
+            conn.rollback()
+            finish_sync_date(conn, day, error=str(exc)[:1000])
+            raise
+        record_sync_page(conn, day, 0, day_stats)
+        finish_sync_date(conn, day)
+        _add_stats(stats, day_stats)
+        current += timedelta(days=1)
+
+    # Publications dated outside the requested window (should not happen)
+    leftovers = [pub for pubs in by_day.values() for pub in pubs]
+    if leftovers:
+        logging.warning("%s: %d entries outside %s to %s, ingesting anyway", log_prefix, len(leftovers), datum_von, datum_bis)
+        _add_stats(stats, ingest_publications(conn, leftovers, log_prefix=log_prefix))
+
+    return stats
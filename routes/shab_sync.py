@@ -0,0 +1,268 @@
+"""
+Per-day SHAB sync bookkeeping.
+
+``shab_sync_state`` has one row per publication date with its status
+(running / done / failed), the next page to fetch, cumulative counts and
+timings. ``sync_shab_date`` resumes an interrupted day from the last
+committed page, and ``catchup_dates`` gives the cron job every day missed
+since the last successful one.
+"""
+
+import os
+import logging
+from datetime import date, timedelta
+from itertools import chain
+
+from routes.shab import SHAB_CANTON_SHARDS, SHAB_PAGE_SIZE, iter_shab_pages, iter_sharded_pages, prefetch
+from routes.shab_archive import clear_archived_days, iter_archived_pages
+from routes.shab_ingest import BRANCHE_DEFER, STAT_KEYS, ingest_pages, new_stats
+
+# The cron job catches up at most this many days; older gaps need backfill_shab.py
+SHAB_CATCHUP_MAX_DAYS = int(os.getenv("SHAB_CATCHUP_MAX_DAYS", "31"))
+
+_RESET_LIST = ", ".join(f"{col} = 0" for col in ("next_page", "pages", *STAT_KEYS))
+_INCREMENT_LIST = ",\n                ".join(f"{col} = {col} + %s" for col in STAT_KEYS)
+
+
+def ensure_sync_state_table(cur) -> None:
+    """Create the shab_sync_state table if it doesn't exist yet."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS shab_sync_state (
+            sync_date DATE PRIMARY KEY,
+            status VARCHAR(20) NOT NULL DEFAULT 'running',
+            next_page INTEGER NOT NULL DEFAULT 0,
+            pages INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            updated INTEGER NOT NULL DEFAULT 0,
+            skipped_unchanged INTEGER NOT NULL DEFAULT 0,
+            duplicates INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            branche_pending INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            started_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    cur.execute("ALTER TABLE shab_sync_state ADD COLUMN IF NOT EXISTS duplicates INTEGER NOT NULL DEFAULT 0")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_shab_sync_state_status ON shab_sync_state(status)")
+
+
+# ---------------------------- STATE ----------------------------
+def get_sync_states(conn, date_von: str, date_bis: str) -> dict:
+    """Sync state rows for a date range, keyed by ISO date."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT * FROM shab_sync_state WHERE sync_date BETWEEN %s AND %s",
+            (date_von, date_bis),
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return {row["sync_date"].isoformat(): row for row in rows}
+
+
+def start_sync_date(conn, sync_date: str, restart: bool = False) -> int:
+    """Mark a date as running and return the page to start from.
+
+    An unfinished or failed date resumes at its page cursor; a finished one
+    (or ``restart=True``) starts over with fresh counts.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO shab_sync_state (sync_date) VALUES (%s) ON CONFLICT (sync_date) DO NOTHING",
+            (sync_date,),
+        )
+        cur.execute("SELECT status FROM shab_sync_state WHERE sync_date = %s FOR UPDATE", (sync_date,))
+        if restart or cur.fetchone()["status"] == "done":
+            cur.execute(f"UPDATE shab_sync_state SET {_RESET_LIST} WHERE sync_date = %s", (sync_date,))
+        cur.execute(
+            """
+            UPDATE shab_sync_state SET
+                status = 'running',
+                attempts = attempts + 1,
+                last_error = NULL,
+                started_at = CURRENT_TIMESTAMP,
+                updated_at = CURRENT_TIMESTAMP,
+                finished_at = NULL
+            WHERE sync_date = %s
+            RETURNING next_page
+            """,
+            (sync_date,),
+        )
+        next_page = cur.fetchone()["next_page"]
+    conn.commit()
+    return next_page
+
+
+def record_sync_page(conn, sync_date: str, page: int, page_stats: dict) -> None:
+    """Advance the page cursor after a page has been committed."""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            UPDATE shab_sync_state SET
+                next_page = %s,
+                pages = pages + 1,
+                {_INCREMENT_LIST},
+                updated_at = CURRENT_TIMESTAMP
+            WHERE sync_date = %s
+            """,
+            (page + 1, *(page_stats[key] for key in STAT_KEYS), sync_date),
+        )
+    conn.commit()
+
+
+def finish_sync_date(conn, sync_date: str, error: str | None = None) -> None:
+    """Mark a date as done (or failed with ``error``).
+
+    Today and later dates can still get publications, so they stay
+    'running' with the page cursor back at 0: the watermark doesn't move
+    past them and the next catch-up fetches them again in full.
+    """
+    complete = date.fromisoformat(str(sync_date)) < date.today()
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE shab_sync_state SET
+                status = %s,
+                next_page = CASE WHEN %s THEN next_page ELSE 0 END,
+                last_error = %s,
+                updated_at = CURRENT_TIMESTAMP,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE sync_date = %s
+            """,
+            ("failed" if error else "done" if complete else "running", complete or bool(error), error, sync_date),
+        )
+    conn.commit()
+
+
+def last_synced_date(conn) -> date | None:
+    """The watermark: latest publication date that was synced completely."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT MAX(sync_date) AS sync_date FROM shab_sync_state WHERE status = 'done'")
+        row = cur.fetchone()
+    conn.commit()
+    return row["sync_date"] if row else None
+
+
+def catchup_dates(conn, until: date, max_days: int = SHAB_CATCHUP_MAX_DAYS) -> list[str]:
+    """Dates the cron job should sync, oldest first.
+
+    Everything after the watermark up to ``until``, plus unfinished or
+    failed dates in the same window. Without any watermark only ``until``.
+    """
+    window_start = until - timedelta(days=max(1, max_days) - 1)
+    watermark = last_synced_date(conn)
+
+    if watermark is None:
+        start = until
+    else:
+        start = watermark + timedelta(days=1)
+        if start < window_start:
+            logging.warning(
+                "SHAB sync: watermark %s is more than %d days old, catching up from %s only "
+                "(use backfill_shab.py for the gap)",
+                watermark, max_days, window_start,
+            )
+            start = window_start
+
+    states = get_sync_states(conn, window_start.isoformat(), until.isoformat())
+    dates = {
+        day for day, state in states.items()
+        if state["status"] != "done" and date.fromisoformat(day) <= until
+    }
+    current = start
+    while current <= until:
+        dates.add(current.isoformat())
+        current += timedelta(days=1)
+    return sorted(dates)
+
+
+# ---------------------------- SYNC ----------------------------
+def _page_done(conn, sync_date: str, page: int, page_stats: dict, on_page) -> None:
+    record_sync_page(conn, sync_date, page, page_stats)
+    if on_page is not None:
+        on_page(page, page_stats)
+
+
+def sync_shab_date(conn, sync_date: str, log_prefix: str = "SHAB", restart: bool = False,
+                   replay: bool = False, defer_classification: bool = BRANCHE_DEFER,
+                   stats: dict | None = None, on_page=None, shards: int = SHAB_CANTON_SHARDS) -> dict:
+    """Sync one publication date, tracked in shab_sync_state.
+
+    Resumes an interrupted date at the page after the last committed one.
+    Errors mark the date as failed and are re-raised. Returns the stats of
+    this run (pass ``stats`` to keep partial counts on failure). ``on_page``
+    is passed on to ingest_pages. With ``shards`` > 1 the cantons are
+    fetched in parallel groups; that mode has no page cursor, so an
+    interrupted date starts over. A date fetched from its first page
+    replaces its archived pages. ``replay`` hands over to replay_shab_date.
+    """
+    if replay:
+        return replay_shab_date(
+            conn, sync_date, log_prefix=log_prefix, defer_classification=defer_classification,
+            stats=stats, on_page=on_page,
+        )
+
+    sharded = shards > 1
+    start_page = start_sync_date(conn, sync_date, restart=restart or sharded)
+    if start_page:
+        logging.info("%s: resuming %s at page %d", log_prefix, sync_date, start_page)
+    else:
+        clear_archived_days(sync_date, sync_date)
+
+    if sharded:
+        pages = iter_sharded_pages(sync_date, sync_date, shards=shards)
+    else:
+        pages = prefetch(iter_shab_pages(sync_date, sync_date, start_page=start_page))
+
+    if stats is None:
+        stats = new_stats()
+    try:
+        ingest_pages(
+            conn, pages, log_prefix=log_prefix, stats=stats,
+            defer_classification=defer_classification,
+            on_page=lambda page, page_stats: _page_done(conn, sync_date, page, page_stats, on_page),
+        )
+    except Exception as exc:
+        conn.rollback()
+        finish_sync_date(conn, sync_date, error=str(exc)[:1000])
+        raise
+
+    finish_sync_date(conn, sync_date)
+    return stats
+
+
+def replay_shab_date(conn, sync_date: str, log_prefix: str = "SHAB",
+                     defer_classification: bool = BRANCHE_DEFER, stats: dict | None = None,
+                     on_page=None) -> dict:
+    """Re-ingest one date from the local SHAB archive.
+
+    Not tracked in shab_sync_state: the archive may be incomplete (or empty
+    on a fresh container), so a replay must never move the watermark.
+    Raises RuntimeError if nothing is archived for the date.
+    """
+    pages = iter_archived_pages(sync_date, sync_date, SHAB_PAGE_SIZE)
+    first = next(pages, None)
+    if first is None:
+        raise RuntimeError(f"nothing archived for {sync_date}")
+    return ingest_pages(
+        conn, chain([first], pages), log_prefix=log_prefix, stats=stats,
+        defer_classification=defer_classification, on_page=on_page,
+    )
+
+
+def sync_shab_cantons(conn, datum_von: str, datum_bis: str, cantons: list[str], log_prefix: str = "SHAB",
+                      stats: dict | None = None, on_page=None, shards: int | None = None,
+                      defer_classification: bool = BRANCHE_DEFER) -> dict:
+    """Sync only the given cantons, one parallel request group per canton by default.
+
+    Not tracked in shab_sync_state: a partial sync must not move the
+    watermark for the whole country.
+    """
+    pages = iter_sharded_pages(datum_von, datum_bis, cantons=cantons, shards=shards or len(cantons))
+    return ingest_pages(
+        conn, pages, log_prefix=log_prefix, stats=stats,
+        defer_classification=defer_classification, on_page=on_page,
+    )
@@ -0,0 +1,217 @@
+"""
+Postgres-backed job queue for SHAB syncs.
+
+The web endpoints only insert a row into ``sync_jobs`` and return its id;
+``python sync_job_worker.py`` claims queued jobs with
+``FOR UPDATE SKIP LOCKED``, runs them day by day through ``sync_shab_date``
+and writes progress and stats back to the row. ``/zevix/jobs/<id>`` reads it.
+"""
+
+import os
+import socket
+import logging
+from datetime import date, timedelta
+
+from psycopg.types.json import Jsonb
+
+from routes.shab_ingest import STAT_KEYS, new_stats
+from routes.shab_sync import sync_shab_cantons, sync_shab_date
+
+# A running job whose worker stopped reporting for this long is picked up again
+SYNC_JOB_STALE_SECONDS = int(os.getenv("SYNC_JOB_STALE_SECONDS", "900"))
+
+SYNC_RANGE_JOB = "sync_range"
+
+
+def ensure_sync_jobs_table(cur) -> None:
+    """Create the sync_jobs table if it doesn't exist yet."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_jobs (
+            id SERIAL PRIMARY KEY,
+            kind VARCHAR(30) NOT NULL,
+            params JSONB NOT NULL DEFAULT '{}'::jsonb,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            requested_by VARCHAR(255),
+            progress JSONB NOT NULL DEFAULT '{}'::jsonb,
+            error TEXT,
+            worker VARCHAR(255),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_sync_jobs_status ON sync_jobs(status, id)")
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------- QUEUE ----------------------------
+def enqueue_sync_job(conn, kind: str, params: dict, requested_by: str | None = None) -> tuple[int, bool]:
+    """Queue a job. Returns (job_id, created).
+
+    If an identical job is still queued or running, its id is returned
+    instead of queueing a duplicate.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT id FROM sync_jobs
+            WHERE kind = %s AND params = %s AND status IN ('queued', 'running')
+            ORDER BY id
+            LIMIT 1
+            """,
+            (kind, Jsonb(params)),
+        )
+        existing = cur.fetchone()
+        if existing:
+            conn.commit()
+            return existing["id"], False
+        cur.execute(
+            """
+            INSERT INTO sync_jobs (kind, params, requested_by)
+            VALUES (%s, %s, %s)
+            RETURNING id
+            """,
+            (kind, Jsonb(params), requested_by),
+        )
+        job_id = cur.fetchone()["id"]
+    conn.commit()
+    return job_id, True
+
+
+def claim_sync_job(conn, worker: str) -> dict | None:
+    """Take the oldest queued job (or a stale running one) and mark it running."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE sync_jobs SET
+                status = 'running',
+                worker = %s,
+                attempts = attempts + 1,
+                started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id FROM sync_jobs
+                WHERE status = 'queued'
+                   OR (status = 'running' AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+            """,
+            (worker, SYNC_JOB_STALE_SECONDS),
+        )
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+
+def update_sync_job(conn, job_id: int, progress: dict) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE sync_jobs SET progress = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (Jsonb(progress), job_id),
+        )
+    conn.commit()
+
+
+def finish_sync_job(conn, job_id: int, progress: dict, error: str | None = None) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE sync_jobs SET
+                status = %s,
+                progress = %s,
+                error = %s,
+                updated_at = CURRENT_TIMESTAMP,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """,
+            ("failed" if error else "done", Jsonb(progress), error, job_id),
+        )
+    conn.commit()
+
+
+def get_sync_job(conn, job_id: int) -> dict | None:
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM sync_jobs WHERE id = %s", (job_id,))
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+
+def serialize_sync_job(job: dict) -> dict:
+    """JSON-safe view of a job row for the API."""
+    result = {
+        "id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "params": job["params"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "attempts": job["attempts"],
+    }
+    for key in ("created_at", "started_at", "updated_at", "finished_at"):
+        result[key] = job[key].isoformat() if job[key] else None
+    return result
+
+
+# ---------------------------- RUN ----------------------------
+def run_sync_job(conn, job: dict) -> dict:
+    """Run a claimed SYNC_RANGE_JOB day by day and record its progress.
+
+    Days are tracked in shab_sync_state, so a job picked up again after a
+    worker crash resumes where it stopped. Jobs with ``kantone`` only fetch
+    those cantons (in parallel) and are not tracked per day. An explicit
+    ``dates`` list (the cron catch-up) replaces the full range.
+    """
+    params = job["params"] or {}
+    datum_von = date.fromisoformat(params["datum_von"])
+    datum_bis = date.fromisoformat(params["datum_bis"])
+    cantons = params.get("kantone")
+    days = params.get("dates") or [
+        (datum_von + timedelta(days=i)).isoformat() for i in range((datum_bis - datum_von).days + 1)
+    ]
+
+    # A re-claimed job continues after the days it already finished
+    previous = job["progress"] or {}
+    stats = new_stats()
+    stats.update(previous.get("stats") or {})
+    progress = {
+        "days_total": len(days),
+        "days_done": previous.get("days_done", 0),
+        "current_date": None,
+        "stats": stats,
+    }
+    log_prefix = f"JOB {job['id']}"
+
+    def on_page(page, page_stats):
+        update_sync_job(conn, job["id"], progress)
+
+    try:
+        for day in days[progress["days_done"]:]:
+            progress["current_date"] = day
+            update_sync_job(conn, job["id"], progress)
+            if cantons:
+                sync_shab_cantons(conn, day, day, cantons, log_prefix=f"{log_prefix} {day}", stats=stats, on_page=on_page)
+            else:
+                sync_shab_date(conn, day, log_prefix=f"{log_prefix} {day}", stats=stats, on_page=on_page)
+            progress["days_done"] += 1
+    except Exception as exc:
+        logging.error("%s: failed on %s: %s", log_prefix, progress["current_date"], exc)
+        conn.rollback()
+        finish_sync_job(conn, job["id"], progress, error=str(exc)[:1000])
+        return progress
+
+    progress["current_date"] = None
+    finish_sync_job(conn, job["id"], progress)
+    logging.info(
+        "%s: done, %d days, %s",
+        log_prefix, len(days), ", ".join(f"{key}={stats[key]}" for key in STAT_KEYS),
+    )
+    return progress
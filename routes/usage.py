@@ -0,0 +1,221 @@
+"""
+Monthly lead export ledger.
+
+Every exported lead is one row in ``usage_exports`` keyed by
+(user_email, month, lead_id), so duplicate exports are detected by the
+primary key instead of reading and rewriting a JSON array. ``usage.used``
+stays the monthly counter and is updated in the same transaction as the
+ledger rows. ``usage.used_ids`` is legacy and no longer written.
+
+Clients keep their own copy of the month's exported ids: login and
+refresh-token only return ``used_ids_version`` (the newest ledger ``seq``),
+and ``used_ids_since`` returns the ids added after a known version. A
+plan-upgrade reset moves ``usage.ids_reset_seq`` past every existing
+``seq``, so clients holding an older version get the full list again.
+
+Exports go through ``reserve_exports``: one call of the
+``export_leads_quota`` database function that locks the month's usage row,
+checks the plan limit, skips duplicates and records the new exports, so
+concurrent requests of the same user can't both pass the limit.
+"""
+
+from psycopg.types.json import Jsonb
+
+EXPORT_QUOTA_FUNCTION = """
+    CREATE OR REPLACE FUNCTION export_leads_quota(
+        p_email TEXT, p_month TEXT, p_lead_ids TEXT[], p_limits JSONB,
+        OUT status TEXT, OUT plan_limit INTEGER, OUT used_count INTEGER,
+        OUT new_ids TEXT[], OUT duplicate_ids TEXT[], OUT not_exported TEXT[]
+    ) LANGUAGE plpgsql AS $$
+    DECLARE
+        v_plan TEXT;
+        v_candidates TEXT[];
+        v_free INTEGER;
+    BEGIN
+        new_ids := '{}';
+        duplicate_ids := '{}';
+        not_exported := '{}';
+        plan_limit := 0;
+        used_count := 0;
+
+        SELECT lower(trim(coalesce(u.plan, 'none'))) INTO v_plan
+        FROM users u WHERE lower(u.email) = lower(p_email)
+        LIMIT 1;
+        IF NOT FOUND THEN
+            status := 'user_not_found';
+            RETURN;
+        END IF;
+        plan_limit := coalesce((p_limits ->> v_plan)::INTEGER, 0);
+        IF plan_limit <= 0 THEN
+            status := 'no_plan';
+            RETURN;
+        END IF;
+
+        -- The locked usage row serializes all exports of this user and month
+        INSERT INTO usage (user_email, month, used, used_ids)
+        VALUES (p_email, p_month, 0, '[]'::jsonb)
+        ON CONFLICT (user_email, month) DO NOTHING;
+        SELECT u.used INTO used_count
+        FROM usage u WHERE u.user_email = p_email AND u.month = p_month
+        FOR UPDATE;
+
+        SELECT coalesce(array_agg(r.id ORDER BY r.pos) FILTER (WHERE e.lead_id IS NOT NULL), '{}'),
+               coalesce(array_agg(r.id ORDER BY r.pos) FILTER (WHERE e.lead_id IS NULL), '{}')
+        INTO duplicate_ids, v_candidates
+        FROM (
+            SELECT t.id, min(t.pos) AS pos
+            FROM unnest(p_lead_ids) WITH ORDINALITY AS t(id, pos)
+            GROUP BY t.id
+        ) r
+        LEFT JOIN usage_exports e
+            ON e.user_email = p_email AND e.month = p_month AND e.lead_id = r.id;
+
+        v_free := greatest(plan_limit - used_count, 0);
+        new_ids := coalesce(v_candidates[1:v_free], '{}');
+        not_exported := coalesce(v_candidates[v_free + 1:], '{}');
+
+        IF cardinality(new_ids) > 0 THEN
+            INSERT INTO usage_exports (user_email, month, lead_id)
+            SELECT p_email, p_month, unnest(new_ids);
+            UPDATE usage u SET used = u.used + cardinality(new_ids)
+            WHERE u.user_email = p_email AND u.month = p_month
+            RETURNING u.used INTO used_count;
+        END IF;
+        status := 'ok';
+    END;
+    $$
+"""
+
+
+def ensure_usage_exports_table(cur) -> None:
+    """Create usage_exports and copy the lead ids from the old usage.used_ids arrays."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS usage_exports (
+            user_email VARCHAR(255) NOT NULL,
+            month VARCHAR(7) NOT NULL,
+            lead_id VARCHAR(100) NOT NULL,
+            exported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_email, month, lead_id)
+        )
+    """)
+
+    cur.execute("SELECT to_regclass('usage') IS NOT NULL AS exists")
+    if not cur.fetchone()["exists"]:
+        return
+    # used_ids was written both as a JSON array and as a JSON-encoded string
+    cur.execute("""
+        INSERT INTO usage_exports (user_email, month, lead_id)
+        SELECT u.user_email, u.month, ids.lead_id
+        FROM usage u
+        CROSS JOIN LATERAL jsonb_array_elements_text(
+            CASE jsonb_typeof(u.used_ids::jsonb)
+                WHEN 'array' THEN u.used_ids::jsonb
+                WHEN 'string' THEN (u.used_ids::jsonb #>> '{}')::jsonb
+                ELSE '[]'::jsonb
+            END
+        ) AS ids(lead_id)
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def ensure_used_ids_version(cur) -> None:
+    """Number ledger rows with a global sequence so clients can fetch deltas."""
+    cur.execute("ALTER TABLE usage_exports ADD COLUMN IF NOT EXISTS seq BIGSERIAL")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_usage_exports_seq ON usage_exports(user_email, month, seq)")
+    cur.execute("SELECT to_regclass('usage') IS NOT NULL AS exists")
+    if cur.fetchone()["exists"]:
+        cur.execute("ALTER TABLE usage ADD COLUMN IF NOT EXISTS ids_reset_seq BIGINT NOT NULL DEFAULT 0")
+
+
+def ensure_usage_row(cur, user_email: str, month: str) -> None:
+    cur.execute(
+        """
+        INSERT INTO usage (user_email, month, used, used_ids)
+        VALUES (%s, %s, 0, '[]'::jsonb)
+        ON CONFLICT (user_email, month) DO NOTHING
+        """,
+        (user_email, month),
+    )
+
+
+def usage_state(cur, user_email: str, month: str) -> dict:
+    """The month's used count, used_ids_version and ids_reset_seq (all 0 without usage row)."""
+    cur.execute(
+        """
+        SELECT u.used, u.ids_reset_seq,
+               greatest(u.ids_reset_seq, coalesce(
+                   (SELECT max(e.seq) FROM usage_exports e
+                    WHERE e.user_email = u.user_email AND e.month = u.month), 0
+               )) AS used_ids_version
+        FROM usage u
+        WHERE u.user_email = %s AND u.month = %s
+        """,
+        (user_email, month),
+    )
+    row = cur.fetchone() or {}
+    return {
+        "used": int(row.get("used") or 0),
+        "used_ids_version": int(row.get("used_ids_version") or 0),
+        "ids_reset_seq": int(row.get("ids_reset_seq") or 0),
+    }
+
+
+def used_ids_since(cur, user_email: str, month: str, since: int | None = None) -> dict:
+    """Lead ids exported after version ``since`` (all of them when ``since`` is None).
+
+    ``full`` tells the client to replace its list instead of extending it:
+    no version given, or the month was reset after that version.
+    """
+    state = usage_state(cur, user_email, month)
+    full = since is None or since < state["ids_reset_seq"] or since > state["used_ids_version"]
+    cur.execute(
+        """
+        SELECT lead_id FROM usage_exports
+        WHERE user_email = %s AND month = %s AND seq > %s
+        ORDER BY seq
+        """,
+        (user_email, month, 0 if full else since),
+    )
+    return {
+        "used": state["used"],
+        "used_ids_version": state["used_ids_version"],
+        "full": full,
+        "ids": [row["lead_id"] for row in cur.fetchall()],
+    }
+
+
+def ensure_export_quota_function(cur) -> None:
+    """Create (or replace) the export_leads_quota() function used by reserve_exports."""
+    cur.execute(EXPORT_QUOTA_FUNCTION)
+
+
+def reserve_exports(conn, user_email: str, month: str, lead_ids: list, limits: dict) -> dict:
+    """Check the plan limit, skip duplicates and record new exports in one round trip.
+
+    ``limits`` maps plan names to monthly limits. Returns status
+    ("ok", "user_not_found" or "no_plan"), plan_limit, used_count (after
+    this call), new_ids (recorded now), duplicate_ids (exported before)
+    and not_exported (over the limit), all in request order.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT * FROM export_leads_quota(%s, %s, %s, %s)",
+            (user_email, month, [str(lead_id) for lead_id in lead_ids], Jsonb(limits)),
+        )
+        result = cur.fetchone()
+    conn.commit()
+    return result
+
+
+def reset_month_usage(cur, user_email: str, month: str) -> None:
+    """Start the month over (plan upgrade): counter to 0, ledger rows removed."""
+    cur.execute("DELETE FROM usage_exports WHERE user_email = %s AND month = %s", (user_email, month))
+    cur.execute(
+        """
+        UPDATE usage
+        SET used = 0, used_ids = '[]'::jsonb,
+            ids_reset_seq = nextval(pg_get_serial_sequence('usage_exports', 'seq'))
+        WHERE user_email = %s AND month = %s
+        """,
+        (user_email, month),
+    )
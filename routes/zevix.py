@@ -1,21 +1,48 @@
 import os
+import json
+import atexit
+import base64
+import binascii
 import logging
 import bcrypt
 import jwt
-import json
-import psycopg
 import stripe
 import time
-import requests as http_requests
 from datetime import datetime, timedelta, date
 from flask import Blueprint, jsonify, request, session
 from hmac import compare_digest
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
 from threading import Lock
-import openai
+
+from routes.branche import branche_cache_stats
+from routes.shab import (
+    ALLE_KANTONE,
+    LEADS_SORT_DATE,
+    parse_date_to_iso,
+    parse_cantons,
+)
+from routes.shab_sync import catchup_dates
+from routes.sync_jobs import (
+    SYNC_RANGE_JOB,
+    enqueue_sync_job,
+    get_sync_job,
+    serialize_sync_job,
+)
+from routes.usage import ensure_usage_row, reserve_exports, reset_month_usage, usage_state, used_ids_since
 
 # ---------------------------- CONFIG ----------------------------
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Postgres connection pool behind get_conn (one per process / gunicorn worker)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+DB_POOL = None
+DB_POOL_PID = None
+DB_POOL_LOCK = Lock()
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key")
 
@@ -43,27 +70,6 @@ LEADS_LIMIT_BY_PLAN = {
     "enterprise": 4500,
 }
 
-# ---------------------------- SHAB CONFIG ----------------------------
-ALLE_KANTONE = [
-    "AG", "AI", "AR", "BE", "BL", "BS", "FR", "GE", "GL", "GR",
-    "JU", "LU", "NE", "NW", "OW", "SG", "SH", "SO", "SZ", "TG",
-    "TI", "UR", "VD", "VS", "ZG", "ZH",
-]
-
-RECHTSFORMEN = {
-    "0101": "Einzelunternehmen",
-    "0103": "Kollektivgesellschaft",
-    "0104": "Kommanditgesellschaft",
-    "0106": "Aktiengesellschaft",
-    "0107": "GmbH",
-    "0108": "Genossenschaft",
-    "0109": "Verein",
-    "0110": "Stiftung",
-    "0113": "Zweigniederlassung",
-}
-
-SHAB_API_URL = "https://www.shab.ch/api/v1/publications"
-
 # ---------------------------- HELPERS ----------------------------
 def normalize_plan(plan: str | None) -> str:
     value = str(plan or "none").strip().lower()
@@ -79,34 +85,6 @@ def normalize_email_candidate(value: str | None) -> str:
         return ""
     return email
 
-def parse_date_to_iso(date_str: str) -> str:
-    """Convert various date formats to ISO 8601 (YYYY-MM-DD).
-
-    Supports:
-    - MM/DD/YYYY (American: 02/25/2026)
-    - DD/MM/YYYY (European: 25/02/2026)
-    - YYYY-MM-DD (ISO: 2026-02-25)
-    - DD.MM.YYYY (Swiss/German: 25.02.2026)
-    """
-    if not date_str:
-        return date_str
-
-    formats = [
-        "%Y-%m-%d",  # ISO - already correct
-        "%m/%d/%Y",  # American
-        "%d/%m/%Y",  # European
-        "%d.%m.%Y",  # Swiss/German
-    ]
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str.strip(), fmt).strftime("%Y-%m-%d")
-        except ValueError:
-            continue
-
-    logging.warning("Could not parse date format: %s, using as-is", date_str)
-    return date_str
-
-
 def default_auth_until_ms() -> int:
     return int((datetime.now() + timedelta(days=30)).timestamp() * 1000)
 
@@ -128,6 +106,26 @@ def get_leads_limit(plan: str) -> int:
     return LEADS_LIMIT_BY_PLAN.get(normalize_plan(plan), 0)
 
 
+def encode_leads_cursor(pub_date: date | None, lead_id: int) -> str:
+    """Opaque cursor for /zevix/leads: position after (publikation_datum, id)."""
+    raw = json.dumps([pub_date.isoformat() if pub_date else None, lead_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_leads_cursor(cursor: str) -> tuple[str, int]:
+    """Returns (sort date for LEADS_SORT_DATE, id). Raises ValueError for invalid cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        pub_date, lead_id = json.loads(raw)
+        # Leads without a date sort as -infinity (see LEADS_SORT_DATE)
+        sort_date = date.fromisoformat(pub_date).isoformat() if pub_date is not None else "-infinity"
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(lead_id, int):
+        raise ValueError("invalid cursor")
+    return sort_date, lead_id
+
+
 def create_jwt_token(email: str, plan: str, valid_until: int) -> str:
     expiration = datetime.utcnow() + timedelta(days=30)
     payload = {
@@ -153,10 +151,78 @@ def verify_password(password: str, stored_password: str | None) -> bool:
     return bcrypt.checkpw(password.encode(), stored_password.encode())
 
 
+def get_db_pool() -> ConnectionPool:
+    """The process-wide pool behind get_conn, created on first use.
+
+    Created per process: a pool inherited from the gunicorn master through
+    fork shares its sockets with the parent and is never used.
+    """
+    global DB_POOL, DB_POOL_PID
+    pid = os.getpid()
+    if DB_POOL is not None and DB_POOL_PID == pid:
+        return DB_POOL
+    with DB_POOL_LOCK:
+        if DB_POOL is None or DB_POOL_PID != pid:
+            DB_POOL = create_conn_pool(DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE)
+            DB_POOL_PID = pid
+        return DB_POOL
+
+
+def close_db_pool() -> None:
+    global DB_POOL
+    with DB_POOL_LOCK:
+        if DB_POOL is not None and DB_POOL_PID == os.getpid():
+            DB_POOL.close()
+        DB_POOL = None
+
+
+atexit.register(close_db_pool)
+
+
+def db_pool_stats() -> dict:
+    with DB_POOL_LOCK:
+        pool = DB_POOL if DB_POOL_PID == os.getpid() else None
+    if pool is None:
+        return {"open": False}
+    return {"open": True, "pid": DB_POOL_PID, **pool.get_stats()}
+
+
 def get_conn():
+    """Borrow a pooled connection: ``with get_conn() as conn:``.
+
+    Commits (or rolls back on error) at the end of the block, like a plain
+    psycopg connection, then returns the connection to the pool.
+    """
+    return get_db_pool().connection()
+
+
+def valid_sync_range(datum_von: str, datum_bis: str) -> bool:
+    """A well-formed range that doesn't reach past today (no publications yet)."""
+    try:
+        return date.fromisoformat(datum_von) <= date.fromisoformat(datum_bis) <= date.today()
+    except (TypeError, ValueError):
+        return False
+
+
+def create_conn_pool(max_size: int, min_size: int = 1) -> ConnectionPool:
+    """Open a connection pool with the same settings as get_conn (for multi-threaded scripts).
+
+    Connections are checked before they are handed out and replaced after
+    DB_POOL_MAX_LIFETIME seconds.
+    """
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL fehlt")
-    return psycopg.connect(f"{DATABASE_URL}?sslmode=require", row_factory=dict_row)
+    return ConnectionPool(
+        f"{DATABASE_URL}?sslmode=require",
+        min_size=min_size,
+        max_size=max_size,
+        kwargs={"row_factory": dict_row},
+        check=ConnectionPool.check_connection,
+        timeout=DB_POOL_TIMEOUT,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        max_idle=DB_POOL_MAX_IDLE,
+        open=True,
+    )
 
 
 def configured_price_plan_map() -> dict[str, str]:
@@ -249,14 +315,7 @@ def apply_checkout_result_to_user(checkout_session: dict) -> tuple[bool, str]:
                         "Plan upgrade detected for %s: %s -> %s. Resetting usage for %s",
                         email, old_plan, new_plan, month,
                     )
-                    cur.execute(
-                        """
-                        UPDATE usage
-                        SET used = 0, used_ids = '[]'::jsonb
-                        WHERE user_email = %s AND month = %s
-                        """,
-                        (email, month),
-                    )
+                    reset_month_usage(cur, email, month)
 
                 conn.commit()
                 
@@ -436,14 +495,7 @@ def sync_user_plan_from_stripe(email: str, current_plan: str, force: bool = Fals
                                 "Plan upgrade detected for %s: %s -> %s. Resetting usage for %s",
                                 email, normalized_current_plan, reconciled_plan, month,
                             )
-                            cur.execute(
-                                """
-                                UPDATE usage
-                                SET used = 0, used_ids = '[]'::jsonb
-                                WHERE user_email = %s AND month = %s
-                                """,
-                                (email, month),
-                            )
+                            reset_month_usage(cur, email, month)
                     conn.commit()
             except Exception as exc:
                 logging.warning("Lokales Plan-Reconciliation fehlgeschlagen, email=%s, error=%s", email, exc)
@@ -457,11 +509,6 @@ def sync_user_plan_from_stripe(email: str, current_plan: str, force: bool = Fals
             ACTIVE_STRIPE_REQUESTS.pop(email, None)
 
 
-def find_user_by_email(cur, email: str) -> dict | None:
-    cur.execute("SELECT email, password FROM users WHERE lower(email)=%s", (email.lower(),))
-    return cur.fetchone()
-
-
 def resolve_session_id(data: dict) -> str:
     return str(data.get("session_id") or data.get("sessionId") or "").strip()
 
@@ -520,101 +567,6 @@ def should_sync_stripe_plan(email: str, current_plan: str) -> bool:
     return True
 
 
-# ---------------------------- SHAB HELPERS ----------------------------
-def ai_branche(zweck: str) -> str:
-    """Classify a company's industry sector using OpenAI GPT based on its purpose text."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key or not zweck:
-        return "Sonstige"
-    try:
-        client = openai.OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "Du bist Handelsregister-Analyst. Ordne Firmen anhand ihres Zwecks EINER Branche zu. "
-                        "Antworte NUR mit einem Branchentitel (1-3 Wörter).\n\n"
-                        "ERLAUBTE BRANCHEN:\n"
-                        "Autohandel, IT / Software, Gastronomie, Transport / Logistik, "
-                        "Baugewerbe, Immobilien, Handel, Industrie, Dienstleistungen, "
-                        "Gesundheitswesen, Sonstige"
-                    ),
-                },
-                {"role": "user", "content": zweck[:500]},
-            ],
-            max_tokens=20,
-            temperature=0,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as exc:
-        logging.warning("GPT Branchenklassifizierung fehlgeschlagen: %s", exc)
-        return "Sonstige"
-
-
-def fetch_shab_neueintragungen(datum_von: str, datum_bis: str) -> list:
-    """Fetch HR01 (new company registrations) from the official SHAB.ch API."""
-    # Convert dates to ISO format
-    datum_von = parse_date_to_iso(datum_von)
-    datum_bis = parse_date_to_iso(datum_bis)
-
-    params = {
-        "allowRubricSelection": "true",
-        "cantons": ",".join(ALLE_KANTONE),
-        "includeContent": "true",
-        "pageRequest.page": "0",
-        "pageRequest.size": "2000",
-        "publicationStates": "PUBLISHED",
-        "publicationDate.start": datum_von,
-        "publicationDate.end": datum_bis,
-        "subRubrics": "HR01",
-    }
-
-    headers = {
-        "Accept": "application/json",
-        "Accept-Language": "de",
-    }
-
-    try:
-        resp = http_requests.get(SHAB_API_URL, params=params, headers=headers, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-
-        results = data.get("content", [])
-        logging.info("SHAB API: %d HR01 entries fetched for %s to %s", len(results), datum_von, datum_bis)
-        return results
-
-    except Exception as exc:
-        logging.warning("SHAB API error: %s", exc)
-        return []
-
-
-def ensure_leads_table(cur) -> None:
-    """Create the leads table if it doesn't exist yet."""
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS leads (
-            id SERIAL PRIMARY KEY,
-            uid VARCHAR(20) UNIQUE,
-            firma VARCHAR(500),
-            rechtsform VARCHAR(100),
-            strasse VARCHAR(200),
-            hausnummer VARCHAR(20),
-            plz VARCHAR(10),
-            ort VARCHAR(100),
-            sitz VARCHAR(100),
-            kanton VARCHAR(5),
-            zweck TEXT,
-            branche_ai VARCHAR(100),
-            publikation_datum DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_leads_datum ON leads(publikation_datum)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_leads_kanton ON leads(kanton)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_leads_branche ON leads(branche_ai)")
-
-
 # ---------------------------- Blueprint für ZEVIX ----------------------------
 zevix_bp = Blueprint("zevix", __name__)
 
@@ -665,26 +617,22 @@ def login():
             logging.warning("Login failed: missing credentials for %s", email)
             return jsonify({"success": False, "message": "missing"}), 400
 
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                user = find_user_by_email(cur, email)
-                if not user:
-                    return jsonify({"success": False, "message": "not_found"}), 404
-                if not verify_password(password, user.get("password")):
-                    return jsonify({"success": False, "message": "wrong_password"}), 401
-
         month = get_month_key()
         with get_conn() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT plan, valid_until
+                    SELECT email, password, plan, valid_until
                     FROM users
                     WHERE lower(email)=%s
                     """,
                     (email,),
                 )
-                user_data = cur.fetchone() or {}
+                user_data = cur.fetchone()
+                if not user_data:
+                    return jsonify({"success": False, "message": "not_found"}), 404
+                if not verify_password(password, user_data.get("password")):
+                    return jsonify({"success": False, "message": "wrong_password"}), 401
 
                 plan = normalize_plan(user_data.get("plan"))
                 valid_until = int(user_data.get("valid_until") or default_auth_until_ms())
@@ -698,44 +646,33 @@ def login():
                 else:
                     logging.debug("Skipping Stripe sync (cached), email=%s, plan=%s", email, plan)
 
-                cur.execute(
-                    """
-                    INSERT INTO usage (user_email, month, used, used_ids)
-                    VALUES (%s, %s, 0, '[]'::jsonb)
-                    ON CONFLICT (user_email, month) DO NOTHING
-                    """,
-                    (email, month),
-                )
+                ensure_usage_row(cur, email, month)
 
-                cur.execute(
-                    """
-                    SELECT used, used_ids
-                    FROM usage
-                    WHERE user_email=%s AND month=%s
-                    """,
-                    (email, month),
-                )
-                usage = cur.fetchone() or {}
-                used = int(usage.get("used") or 0)
-                used_ids = usage.get("used_ids") or []
+                # Exported ids only on request; clients sync them via /zevix/usage/ids
+                if data.get("include_used_ids"):
+                    usage = used_ids_since(cur, email, month)
+                else:
+                    usage = usage_state(cur, email, month)
+                used = usage["used"]
             conn.commit()
 
         token = create_jwt_token(email, plan, valid_until)
 
-        response = jsonify(
-            {
-                "success": True,
-                "email": email,
-                "plan": plan,
-                "valid_until": valid_until,
-                # Frontend-Kompatibilität (bestehendes Webflow-Script erwartet auth_until)
-                "auth_until": valid_until,
-                "month": month,
-                "used": used,
-                "used_ids": used_ids,
-                "token": token,
-            }
-        )
+        result = {
+            "success": True,
+            "email": email,
+            "plan": plan,
+            "valid_until": valid_until,
+            # Frontend-Kompatibilität (bestehendes Webflow-Script erwartet auth_until)
+            "auth_until": valid_until,
+            "month": month,
+            "used": used,
+            "used_ids_version": usage["used_ids_version"],
+            "token": token,
+        }
+        if "ids" in usage:
+            result["used_ids"] = usage["ids"]
+        response = jsonify(result)
 
         session["auth_token"] = token
         session["email"] = email
@@ -804,33 +741,29 @@ def refresh_token():
             else:
                 logging.debug("Skipping Stripe sync (cached), email=%s, plan=%s", email, plan)
             
-            cur.execute(
-                """
-                SELECT used, used_ids
-                FROM usage
-                WHERE user_email=%s AND month=%s
-                """,
-                (email, month),
-            )
-            usage = cur.fetchone() or {}
-            used = int(usage.get("used") or 0)
-            used_ids = usage.get("used_ids") or []
+            # Exported ids only on request; clients sync them via /zevix/usage/ids
+            if data.get("include_used_ids"):
+                usage = used_ids_since(cur, email, month)
+            else:
+                usage = usage_state(cur, email, month)
+            used = usage["used"]
     
     new_token = create_jwt_token(email, plan, valid_until)
     
-    response = jsonify(
-        {
-            "success": True,
-            "email": email,
-            "plan": plan,
-            "valid_until": valid_until,
-            "auth_until": valid_until,
-            "month": month,
-            "used": used,
-            "used_ids": used_ids,
-            "token": new_token,
-        }
-    )
+    result = {
+        "success": True,
+        "email": email,
+        "plan": plan,
+        "valid_until": valid_until,
+        "auth_until": valid_until,
+        "month": month,
+        "used": used,
+        "used_ids_version": usage["used_ids_version"],
+        "token": new_token,
+    }
+    if "ids" in usage:
+        result["used_ids"] = usage["ids"]
+    response = jsonify(result)
     
     session["auth_token"] = new_token
     session["email"] = email
@@ -840,6 +773,64 @@ def refresh_token():
     return response
 
 
+# ---------------------------- USAGE IDS ----------------------------
+@zevix_bp.route("/zevix/usage/ids", methods=["GET"])
+def usage_ids():
+    """
+    Lead ids exported this month after version ``since`` (from login,
+    refresh-token or a previous call). Without ``since``, or when the month
+    was reset in between, the full list is returned with ``full: true``.
+    Pass ``month`` (YYYY-MM) from the client's copy so a new month starts over.
+    Requires a valid JWT token.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    token = None
+    if auth_header.lower().startswith("bearer "):
+        token = auth_header[7:].strip()
+
+    user_email = None
+    if token:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            user_email = payload.get("email")
+        except jwt.ExpiredSignatureError:
+            return jsonify({"success": False, "error": "token_expired"}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({"success": False, "error": "invalid_token"}), 401
+
+    if not user_email:
+        user_email = session.get("email")
+
+    if not user_email:
+        return jsonify({"success": False, "error": "not_authenticated"}), 401
+
+    month = get_month_key()
+    since = request.args.get("since")
+    try:
+        since = int(since) if since not in (None, "") else None
+    except ValueError:
+        return jsonify({"success": False, "error": "invalid_since"}), 400
+    if request.args.get("month", month) != month:
+        since = None
+
+    try:
+        with get_conn() as conn:
+            with conn.cursor() as cur:
+                usage = used_ids_since(cur, user_email, month, since)
+    except Exception as exc:
+        logging.error("Fehler beim Laden der exportierten IDs: %s", exc)
+        return jsonify({"success": False, "error": str(exc)}), 500
+
+    return jsonify({
+        "success": True,
+        "month": month,
+        "used": usage["used"],
+        "used_ids_version": usage["used_ids_version"],
+        "full": usage["full"],
+        "ids": usage["ids"],
+    })
+
+
 # ---------------------------- EXPORT LEAD ----------------------------
 @zevix_bp.route("/zevix/export-lead", methods=["POST"])
 def export_lead():
@@ -894,114 +885,58 @@ def export_lead():
     
     month = get_month_key()
     
+    # Limit check, duplicate check and increment in one locked database call
     with get_conn() as conn:
-        with conn.cursor() as cur:
-            # Get user's current plan
-            cur.execute(
-                """
-                SELECT plan
-                FROM users
-                WHERE lower(email)=%s
-                """,
-                (user_email.lower(),),
-            )
-            user_data = cur.fetchone()
-            
-            if not user_data:
-                return jsonify({"success": False, "error": "user_not_found"}), 404
-            
-            plan = normalize_plan(user_data.get("plan"))
-            limit = get_leads_limit(plan)
-            
-            # If user has no plan or limit is 0, deny export
-            if limit == 0:
-                return jsonify({
-                    "success": False,
-                    "error": "no_plan",
-                    "message": "You need an active plan to export leads"
-                }), 403
-            
-            # Ensure usage record exists for this month
-            cur.execute(
-                """
-                INSERT INTO usage (user_email, month, used, used_ids)
-                VALUES (%s, %s, 0, '[]'::jsonb)
-                ON CONFLICT (user_email, month) DO NOTHING
-                """,
-                (user_email, month),
-            )
-            
-            # Get current usage
-            cur.execute(
-                """
-                SELECT used, used_ids
-                FROM usage
-                WHERE user_email=%s AND month=%s
-                """,
-                (user_email, month),
-            )
-            usage = cur.fetchone() or {}
-            used = int(usage.get("used", 0))
-            used_ids_raw = usage.get("used_ids")
-            
-            # Ensure used_ids is a list (handle both JSONB and string cases)
-            if isinstance(used_ids_raw, str):
-                used_ids = json.loads(used_ids_raw) if used_ids_raw else []
-            elif isinstance(used_ids_raw, list):
-                used_ids = used_ids_raw
-            else:
-                used_ids = []
-            
-            # Check for duplicate lead_id
-            if lead_id in used_ids:
-                return jsonify({
-                    "success": False,
-                    "error": "lead_already_used",
-                    "message": "This lead has already been exported",
-                    "used": used,
-                    "remaining": limit - used,
-                    "limit": limit
-                }), 409
-            
-            # Check if user has reached their monthly limit
-            if used >= limit:
-                return jsonify({
-                    "success": False,
-                    "error": "monthly_limit_exceeded",
-                    "message": f"You have 0 leads remaining ({used}/{limit})",
-                    "used": used,
-                    "remaining": 0,
-                    "limit": limit
-                }), 403
-            
-            # Increment usage and add lead_id to used_ids
-            new_used = used + 1
-            new_used_ids = used_ids + [lead_id]
-            
-            cur.execute(
-                """
-                UPDATE usage
-                SET used = %s, used_ids = %s::jsonb
-                WHERE user_email = %s AND month = %s
-                """,
-                (new_used, json.dumps(new_used_ids), user_email, month),
-            )
-            conn.commit()
-            
-            # Update session with new values
-            session["used"] = new_used
-            
-            remaining = limit - new_used
-            
-            return jsonify({
-                "success": True,
-                "used": new_used,
-                "remaining": remaining,
-                "limit": limit,
-                "lead_id": lead_id,
-                "month": month,
-                "message": f"Lead exported successfully. {remaining} leads remaining"
-            })
+        result = reserve_exports(conn, user_email, month, [lead_id], LEADS_LIMIT_BY_PLAN)
+
+    if result["status"] == "user_not_found":
+        return jsonify({"success": False, "error": "user_not_found"}), 404
+
+    # If user has no plan or limit is 0, deny export
+    if result["status"] == "no_plan":
+        return jsonify({
+            "success": False,
+            "error": "no_plan",
+            "message": "You need an active plan to export leads"
+        }), 403
+
+    limit = result["plan_limit"]
+    used = result["used_count"]
+
+    if result["duplicate_ids"]:
+        return jsonify({
+            "success": False,
+            "error": "lead_already_used",
+            "message": "This lead has already been exported",
+            "used": used,
+            "remaining": max(limit - used, 0),
+            "limit": limit
+        }), 409
+
+    if result["not_exported"]:
+        return jsonify({
+            "success": False,
+            "error": "monthly_limit_exceeded",
+            "message": f"You have 0 leads remaining ({used}/{limit})",
+            "used": used,
+            "remaining": 0,
+            "limit": limit
+        }), 403
+
+    # Update session with new values
+    session["used"] = used
+
+    remaining = limit - used
+
+    return jsonify({
+        "success": True,
+        "used": used,
+        "remaining": remaining,
+        "limit": limit,
+        "lead_id": lead_id,
+        "month": month,
+        "message": f"Lead exported successfully. {remaining} leads remaining"
+    })
 
 
 # ---------------------------- EXPORT LEADS BATCH ----------------------------
@@ -1056,137 +991,72 @@ def export_leads_batch():
     
     month = get_month_key()
     
+    # Limit check, duplicate filter and increment in one locked database call
     with get_conn() as conn:
-        with conn.cursor() as cur:
-            # Get user's current plan
-            cur.execute(
-                """
-                SELECT plan
-                FROM users
-                WHERE lower(email)=%s
-                """,
-                (user_email.lower(),),
-            )
-            user_data = cur.fetchone()
-            
-            if not user_data:
-                return jsonify({"success": False, "error": "user_not_found"}), 404
-            
-            plan = normalize_plan(user_data.get("plan"))
-            limit = get_leads_limit(plan)
-            
-            # If user has no plan or limit is 0, deny export
-            if limit == 0:
-                return jsonify({
-                    "success": False,
-                    "error": "no_plan",
-                    "message": "You need an active plan to export leads"
-                }), 403
-            
-            # Ensure usage record exists for this month
-            cur.execute(
-                """
-                INSERT INTO usage (user_email, month, used, used_ids)
-                VALUES (%s, %s, 0, '[]'::jsonb)
-                ON CONFLICT (user_email, month) DO NOTHING
-                """,
-                (user_email, month),
-            )
-            
-            # Get current usage
-            cur.execute(
-                """
-                SELECT used, used_ids
-                FROM usage
-                WHERE user_email=%s AND month=%s
-                """,
-                (user_email, month),
-            )
-            usage = cur.fetchone() or {}
-            used = int(usage.get("used", 0))
-            used_ids_raw = usage.get("used_ids")
-            
-            # Ensure used_ids is a list (handle both JSONB and string cases)
-            if isinstance(used_ids_raw, str):
-                used_ids = json.loads(used_ids_raw) if used_ids_raw else []
-            elif isinstance(used_ids_raw, list):
-                used_ids = used_ids_raw
-            else:
-                used_ids = []
-            
-            # Convert to set for O(n) performance instead of O(n²)
-            used_ids_set = set(used_ids)
-            
-            # Filter out duplicates - only keep lead IDs that haven't been used yet
-            new_ids = [lid for lid in lead_ids if lid not in used_ids_set]
-            duplicate_ids = [lid for lid in lead_ids if lid in used_ids_set]
-            
-            # Calculate how many new leads we can actually export
-            remaining_before = limit - used
-            can_export = min(len(new_ids), remaining_before)
-            
-            if can_export == 0:
-                # Only block if monthly limit is actually exhausted
-                if remaining_before == 0:
-                    return jsonify({
-                        "success": False,
-                        "error": "monthly_limit_exceeded",
-                        "message": f"You have 0 leads remaining ({used}/{limit})",
-                        "used": used,
-                        "remaining": 0,
-                        "limit": limit,
-                        "new_ids": [],
-                        "duplicate_ids": duplicate_ids
-                    }), 403
-                else:
-                    # All duplicates - allow export, but don't consume any leads
-                    lead_word = "lead" if len(duplicate_ids) == 1 else "leads"
-                    return jsonify({
-                        "success": True,
-                        "used": used,
-                        "remaining": remaining_before,
-                        "limit": limit,
-                        "new_ids": [],
-                        "duplicate_ids": duplicate_ids,
-                        "not_exported": [],
-                        "month": month,
-                        "message": f"All {len(duplicate_ids)} {lead_word} already exported (no consumption). {remaining_before} leads remaining"
-                    })
-            
-            # Only export the leads we can afford
-            ids_to_export = new_ids[:can_export]
-            ids_not_exported = new_ids[can_export:]
-            
-            # Increment usage and add lead_ids to used_ids
-            new_used = used + len(ids_to_export)
-            new_used_ids = used_ids + ids_to_export
-            
-            cur.execute(
-                """
-                UPDATE usage
-                SET used = %s, used_ids = %s::jsonb
-                WHERE user_email = %s AND month = %s
-                """,
-                (new_used, json.dumps(new_used_ids), user_email, month),
-            )
-            conn.commit()
-            
-            # Update session with new values
-            session["used"] = new_used
-            
-            remaining = limit - new_used
-            
+        result = reserve_exports(conn, user_email, month, lead_ids, LEADS_LIMIT_BY_PLAN)
+
+    if result["status"] == "user_not_found":
+        return jsonify({"success": False, "error": "user_not_found"}), 404
+
+    # If user has no plan or limit is 0, deny export
+    if result["status"] == "no_plan":
+        return jsonify({
+            "success": False,
+            "error": "no_plan",
+            "message": "You need an active plan to export leads"
+        }), 403
+
+    limit = result["plan_limit"]
+    used = result["used_count"]
+    ids_to_export = result["new_ids"]
+    duplicate_ids = result["duplicate_ids"]
+    ids_not_exported = result["not_exported"]
+
+    if not ids_to_export:
+        # Only block if monthly limit is actually exhausted
+        if used >= limit:
             return jsonify({
-                "success": True,
-                "used": new_used,
-                "remaining": remaining,
+                "success": False,
+                "error": "monthly_limit_exceeded",
+                "message": f"You have 0 leads remaining ({used}/{limit})",
+                "used": used,
+                "remaining": 0,
                 "limit": limit,
-                "new_ids": ids_to_export,
-                "duplicate_ids": duplicate_ids,
-                "not_exported": ids_not_exported,
-                "month": month,
-                "message": f"Successfully exported {len(ids_to_export)} lead(s). {remaining} leads remaining"
-            })
+                "new_ids": [],
+                "duplicate_ids": duplicate_ids
+            }), 403
+
+        # All duplicates - allow export, but don't consume any leads
+        remaining = limit - used
+        lead_word = "lead" if len(duplicate_ids) == 1 else "leads"
+        return jsonify({
+            "success": True,
+            "used": used,
+            "remaining": remaining,
+            "limit": limit,
+            "new_ids": [],
+            "duplicate_ids": duplicate_ids,
+            "not_exported": [],
+            "month": month,
+            "message": f"All {len(duplicate_ids)} {lead_word} already exported (no consumption). {remaining} leads remaining"
+        })
+
+    # Update session with new values
+    session["used"] = used
+
+    remaining = limit - used
+
+    return jsonify({
+        "success": True,
+        "used": used,
+        "remaining": remaining,
+        "limit": limit,
+        "new_ids": ids_to_export,
+        "duplicate_ids": duplicate_ids,
+        "not_exported": ids_not_exported,
+        "month": month,
+        "message": f"Successfully exported {len(ids_to_export)} lead(s). {remaining} leads remaining"
+    })
 
 
 # ---------------------------- CREATE CHECKOUT SESSION ----------------------------
@@ -1353,6 +1223,8 @@ def cache_stats():
             "ttl_seconds": STRIPE_PLAN_CACHE_TTL,
         },
         "active_requests": active_requests,
+        "branche_cache": branche_cache_stats(),
+        "db_pool": db_pool_stats(),
         "performance": {
             "cache_enabled": True,
             "deduplication_enabled": True,
@@ -1365,8 +1237,10 @@ def cache_stats():
 @zevix_bp.route("/zevix/sync-shab", methods=["POST"])
 def sync_shab():
     """
-    Fetches new company registrations (HR01) from the SHAB API,
-    classifies their industry via GPT and upserts them into the leads table.
+    Queues a sync of new company registrations (HR01) from the SHAB API
+    for sync_job_worker.py and returns the job id right away.
+    Progress: GET /zevix/jobs/<id>. Optional "kantone" limits the sync
+    to the given cantons.
     Requires a valid JWT token (admin/authenticated users only).
     """
     auth_header = request.headers.get("Authorization", "")
@@ -1394,108 +1268,32 @@ def sync_shab():
     today = date.today().isoformat()
     datum_von = parse_date_to_iso(data.get("datum_von") or today)
     datum_bis = parse_date_to_iso(data.get("datum_bis") or today)
-
-    publications = fetch_shab_neueintragungen(datum_von, datum_bis)
-
-    inserted = 0
-    updated = 0
-    errors = 0
+    if not valid_sync_range(datum_von, datum_bis):
+        return jsonify({"success": False, "error": "invalid_date_range"}), 400
+    try:
+        kantone = parse_cantons(data.get("kantone"))
+    except ValueError as exc:
+        return jsonify({"success": False, "error": "invalid_canton", "message": str(exc)}), 400
+    params = {"datum_von": datum_von, "datum_bis": datum_bis}
+    if kantone:
+        params["kantone"] = kantone
 
     try:
         with get_conn() as conn:
-            with conn.cursor() as cur:
-                ensure_leads_table(cur)
-                conn.commit()
-
-                for pub in publications:
-                    try:
-                        meta = pub.get("meta", {})
-                        content = pub.get("content", {})
-                        commons = content.get("commonsNew", {}) or content.get("commonsActual", {})
-                        company = commons.get("company", {})
-                        address = company.get("address", {})
-
-                        uid = company.get("uid") or ""
-                        if not uid:
-                            continue
-
-                        firma = company.get("name") or ""
-
-                        # Legal form code to name
-                        rechtsform_code = company.get("legalForm") or ""
-                        rechtsform = RECHTSFORMEN.get(str(rechtsform_code), str(rechtsform_code))
-
-                        # Address fields
-                        strasse = address.get("street") or ""
-                        hausnummer = address.get("houseNumber") or ""
-                        plz = str(address.get("swissZipCode") or "")
-                        ort = address.get("town") or ""
-
-                        sitz = company.get("seat") or ort
-
-                        # Canton from meta
-                        cantons = meta.get("cantons") or []
-                        kanton = cantons[0] if cantons else ""
-
-                        zweck = commons.get("purpose") or ""
-
-                        # Publication date
-                        pub_date_raw = meta.get("publicationDate") or ""
-                        try:
-                            pub_date = pub_date_raw[:10] if pub_date_raw else None
-                        except Exception:
-                            pub_date = None
-
-                        branche = ai_branche(zweck)
-
-                        cur.execute(
-                            """
-                            INSERT INTO leads
-                                (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                                 sitz, kanton, zweck, branche_ai, publikation_datum)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (uid) DO UPDATE SET
-                                firma = EXCLUDED.firma,
-                                rechtsform = EXCLUDED.rechtsform,
-                                strasse = EXCLUDED.strasse,
-                                hausnummer = EXCLUDED.hausnummer,
-                                plz = EXCLUDED.plz,
-                                ort = EXCLUDED.ort,
-                                sitz = EXCLUDED.sitz,
-                                kanton = EXCLUDED.kanton,
-                                zweck = EXCLUDED.zweck,
-                                branche_ai = EXCLUDED.branche_ai,
-                                publikation_datum = EXCLUDED.publikation_datum
-                            RETURNING (xmax = 0) AS inserted
-                            """,
-                            (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                             sitz, kanton, zweck, branche, pub_date)
-                        )
-
-                        row = cur.fetchone()
-                        if row and row.get("inserted"):
-                            inserted += 1
-                        else:
-                            updated += 1
-                    except Exception as exc:
-                        logging.warning("Fehler beim Verarbeiten eines SHAB-Eintrags: %s", exc)
-                        errors += 1
-                        continue
-
-                conn.commit()
+            job_id, created = enqueue_sync_job(conn, SYNC_RANGE_JOB, params, requested_by=user_email)
     except Exception as exc:
-        logging.error("SHAB-Sync fehlgeschlagen: %s", exc)
+        logging.error("SHAB-Sync konnte nicht eingeplant werden: %s", exc)
         return jsonify({"success": False, "error": str(exc)}), 500
 
+    logging.info("SHAB-Sync: job %d %s for %s to %s", job_id, "queued" if created else "already queued", datum_von, datum_bis)
     return jsonify({
         "success": True,
+        "job_id": job_id,
+        "status_url": f"/zevix/jobs/{job_id}",
         "datum_von": datum_von,
         "datum_bis": datum_bis,
-        "total": len(publications),
-        "inserted": inserted,
-        "updated": updated,
-        "errors": errors,
-    })
+        "kantone": kantone or ALLE_KANTONE,
+    }), 202
 
 
 # ---------------------------- CRON SYNC ----------------------------
@@ -1503,6 +1301,8 @@ def sync_shab():
 def cron_sync():
     """
     Daily cron job to sync SHAB data automatically.
+    Queues yesterday plus any days missed since the last completed sync
+    as one job for sync_job_worker.py and returns its id right away.
     Protected by a secret key (not user auth).
     """
     cron_secret = request.headers.get("X-Cron-Secret") or (request.get_json(silent=True) or {}).get("cron_secret")
@@ -1513,133 +1313,39 @@ def cron_sync():
 
     yesterday = (date.today() - timedelta(days=1)).isoformat()
 
-    logging.info("CRON: Starting daily SHAB sync for %s", yesterday)
-
-    try:
-        publications = fetch_shab_neueintragungen(yesterday, yesterday)
-    except Exception as exc:
-        logging.error("CRON: SHAB API error: %s", exc)
-        return jsonify({"success": False, "error": f"SHAB API error: {exc}"}), 500
-
-    if not publications:
-        logging.info("CRON: No new entries found for %s", yesterday)
-        return jsonify({
-            "success": True,
-            "message": "No new entries",
-            "date": yesterday,
-            "total": 0
-        })
-
-    inserted = 0
-    updated = 0
-    errors = 0
-
     try:
         with get_conn() as conn:
-            with conn.cursor() as cur:
-                ensure_leads_table(cur)
-                conn.commit()
-
-                for pub in publications:
-                    try:
-                        meta = pub.get("meta", {})
-                        content = pub.get("content", {})
-                        commons = content.get("commonsNew", {}) or content.get("commonsActual", {})
-                        company = commons.get("company", {})
-                        address = company.get("address", {})
-
-                        uid = company.get("uid") or ""
-                        if not uid:
-                            continue
-
-                        firma = company.get("name") or ""
-                        rechtsform_code = company.get("legalForm") or ""
-                        rechtsform = RECHTSFORMEN.get(str(rechtsform_code), str(rechtsform_code))
-
-                        strasse = address.get("street") or ""
-                        hausnummer = address.get("houseNumber") or ""
-                        plz = str(address.get("swissZipCode") or "")
-                        ort = address.get("town") or ""
-                        sitz = company.get("seat") or ort
-
-                        cantons = meta.get("cantons") or []
-                        kanton = cantons[0] if cantons else ""
-
-                        zweck = commons.get("purpose") or ""
-
-                        pub_date_raw = meta.get("publicationDate") or ""
-                        pub_date = pub_date_raw[:10] if pub_date_raw else None
-
-                        # GPT Klassifizierung - mit Fehlerbehandlung
-                        try:
-                            branche = ai_branche(zweck) if zweck else ""
-                        except Exception as gpt_err:
-                            logging.warning("CRON: GPT error for %s: %s", uid, gpt_err)
-                            branche = ""
-
-                        cur.execute(
-                            """
-                            INSERT INTO leads
-                                (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                                 sitz, kanton, zweck, branche_ai, publikation_datum)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (uid) DO UPDATE SET
-                                firma = EXCLUDED.firma,
-                                rechtsform = EXCLUDED.rechtsform,
-                                strasse = EXCLUDED.strasse,
-                                hausnummer = EXCLUDED.hausnummer,
-                                plz = EXCLUDED.plz,
-                                ort = EXCLUDED.ort,
-                                sitz = EXCLUDED.sitz,
-                                kanton = EXCLUDED.kanton,
-                                zweck = EXCLUDED.zweck,
-                                branche_ai = EXCLUDED.branche_ai,
-                                publikation_datum = EXCLUDED.publikation_datum
-                            RETURNING (xmax = 0) AS inserted
-                            """,
-                            (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                             sitz, kanton, zweck, branche, pub_date)
-                        )
-
-                        row = cur.fetchone()
-                        if row and row.get("inserted"):
-                            inserted += 1
-                        else:
-                            updated += 1
-
-                        # Commit nach jedem Lead (verhindert lange Transaktionen)
-                        conn.commit()
-
-                    except Exception as exc:
-                        logging.warning("CRON: Error processing %s: %s", uid if uid else "unknown", exc)
-                        errors += 1
-                        continue
-
-                conn.commit()
+            dates = catchup_dates(conn, date.today() - timedelta(days=1))
+            if not dates:
+                logging.info("CRON: Nothing to sync up to %s", yesterday)
+                return jsonify({"success": True, "message": "Nothing to sync", "date": yesterday, "dates": []})
+            params = {"datum_von": dates[0], "datum_bis": dates[-1], "dates": dates}
+            job_id, created = enqueue_sync_job(conn, SYNC_RANGE_JOB, params, requested_by="cron")
 
     except Exception as exc:
-        logging.error("CRON: Database error: %s", exc)
+        logging.error("CRON: Could not queue sync: %s", exc)
         return jsonify({
             "success": False,
             "error": str(exc)
         }), 500
 
-    logging.info("CRON: Completed - inserted=%d, updated=%d, errors=%d", inserted, updated, errors)
-
+    logging.info("CRON: job %d %s for %s", job_id, "queued" if created else "already queued", ", ".join(dates))
     return jsonify({
         "success": True,
+        "job_id": job_id,
+        "status_url": f"/zevix/jobs/{job_id}",
         "date": yesterday,
-        "total": len(publications),
-        "inserted": inserted,
-        "updated": updated,
-        "errors": errors
-    })
+        "dates": dates,
+    }), 202
 
 
 # ---------------------------- ADMIN SYNC RANGE ----------------------------
 @zevix_bp.route("/zevix/admin/sync-range", methods=["POST"])
 def admin_sync_range():
-    """Admin endpoint to sync a specific date range (for backfilling data)."""
+    """Admin endpoint to sync a specific date range (for backfilling data).
+
+    Queues a background job; optional "kantone" limits it to those cantons.
+    """
     cron_secret = request.headers.get("X-Cron-Secret") or (request.get_json(silent=True) or {}).get("cron_secret")
     expected_secret = os.getenv("CRON_SECRET")
 
@@ -1655,128 +1361,96 @@ def admin_sync_range():
 
     datum_von = parse_date_to_iso(datum_von)
     datum_bis = parse_date_to_iso(datum_bis)
-
-    logging.info("ADMIN SYNC: Starting SHAB sync for %s to %s", datum_von, datum_bis)
-
-    publications = fetch_shab_neueintragungen(datum_von, datum_bis)
-
-    if not publications:
-        logging.info("ADMIN SYNC: No entries found for %s to %s", datum_von, datum_bis)
-        return jsonify({
-            "success": True,
-            "message": "No entries found",
-            "datum_von": datum_von,
-            "datum_bis": datum_bis,
-            "total": 0
-        })
-
-    inserted = 0
-    updated = 0
-    errors = 0
+    if not valid_sync_range(datum_von, datum_bis):
+        return jsonify({"success": False, "error": "invalid_date_range"}), 400
+    try:
+        kantone = parse_cantons(data.get("kantone"))
+    except ValueError as exc:
+        return jsonify({"success": False, "error": "invalid_canton", "message": str(exc)}), 400
+    params = {"datum_von": datum_von, "datum_bis": datum_bis}
+    if kantone:
+        params["kantone"] = kantone
 
     try:
         with get_conn() as conn:
-            with conn.cursor() as cur:
-                ensure_leads_table(cur)
-                conn.commit()
-
-                for pub in publications:
-                    try:
-                        meta = pub.get("meta", {})
-                        content = pub.get("content", {})
-                        commons = content.get("commonsNew", {}) or content.get("commonsActual", {})
-                        company = commons.get("company", {})
-                        address = company.get("address", {})
+            job_id, created = enqueue_sync_job(conn, SYNC_RANGE_JOB, params, requested_by="admin")
 
-                        uid = company.get("uid") or ""
-                        if not uid:
-                            continue
-
-                        firma = company.get("name") or ""
-                        rechtsform_code = company.get("legalForm") or ""
-                        rechtsform = RECHTSFORMEN.get(str(rechtsform_code), str(rechtsform_code))
-
-                        strasse = address.get("street") or ""
-                        hausnummer = address.get("houseNumber") or ""
-                        plz = str(address.get("swissZipCode") or "")
-                        ort = address.get("town") or ""
-                        sitz = company.get("seat") or ort
+    except Exception as exc:
+        logging.error("ADMIN SYNC: Could not queue job: %s", exc)
+        return jsonify({
+            "success": False,
+            "error": str(exc)
+        }), 500
 
-                        cantons = meta.get("cantons") or []
-                        kanton = cantons[0] if cantons else ""
+    logging.info(
+        "ADMIN SYNC: job %d %s for %s to %s",
+        job_id, "queued" if created else "already queued", datum_von, datum_bis,
+    )
 
-                        zweck = commons.get("purpose") or ""
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status_url": f"/zevix/jobs/{job_id}",
+        "datum_von": datum_von,
+        "datum_bis": datum_bis,
+        "kantone": kantone or ALLE_KANTONE
+    }), 202
 
-                        pub_date_raw = meta.get("publicationDate") or ""
-                        pub_date = pub_date_raw[:10] if pub_date_raw else None
 
-                        branche = ai_branche(zweck)
+# ---------------------------- SYNC JOBS ----------------------------
+@zevix_bp.route("/zevix/jobs/<int:job_id>", methods=["GET"])
+def sync_job_status(job_id):
+    """Status, progress and stats of a queued sync job.
 
-                        cur.execute(
-                            """
-                            INSERT INTO leads
-                                (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                                 sitz, kanton, zweck, branche_ai, publikation_datum)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            ON CONFLICT (uid) DO UPDATE SET
-                                firma = EXCLUDED.firma,
-                                rechtsform = EXCLUDED.rechtsform,
-                                strasse = EXCLUDED.strasse,
-                                hausnummer = EXCLUDED.hausnummer,
-                                plz = EXCLUDED.plz,
-                                ort = EXCLUDED.ort,
-                                sitz = EXCLUDED.sitz,
-                                kanton = EXCLUDED.kanton,
-                                zweck = EXCLUDED.zweck,
-                                branche_ai = EXCLUDED.branche_ai,
-                                publikation_datum = EXCLUDED.publikation_datum
-                            RETURNING (xmax = 0) AS inserted
-                            """,
-                            (uid, firma, rechtsform, strasse, hausnummer, plz, ort,
-                             sitz, kanton, zweck, branche, pub_date)
-                        )
+    Visible with the cron secret or to the user who requested the job.
+    """
+    cron_secret = request.headers.get("X-Cron-Secret")
+    expected_secret = os.getenv("CRON_SECRET")
+    is_admin = bool(expected_secret) and cron_secret == expected_secret
 
-                        row = cur.fetchone()
-                        if row and row.get("inserted"):
-                            inserted += 1
-                        else:
-                            updated += 1
+    user_email = None
+    if not is_admin:
+        auth_header = request.headers.get("Authorization", "")
+        token = None
+        if auth_header.lower().startswith("bearer "):
+            token = auth_header[7:].strip()
 
-                        if (inserted + updated) % 10 == 0:
-                            conn.commit()
+        if token:
+            try:
+                payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+                user_email = payload.get("email")
+            except jwt.ExpiredSignatureError:
+                return jsonify({"success": False, "error": "token_expired"}), 401
+            except jwt.InvalidTokenError:
+                return jsonify({"success": False, "error": "invalid_token"}), 401
 
-                    except Exception as exc:
-                        logging.warning("ADMIN SYNC: Error processing publication: %s", exc)
-                        errors += 1
-                        continue
+        if not user_email:
+            user_email = session.get("email")
 
-                conn.commit()
+        if not user_email:
+            return jsonify({"success": False, "error": "not_authenticated"}), 401
 
+    try:
+        with get_conn() as conn:
+            job = get_sync_job(conn, job_id)
     except Exception as exc:
-        logging.error("ADMIN SYNC: Database error: %s", exc)
-        return jsonify({
-            "success": False,
-            "error": str(exc)
-        }), 500
+        logging.error("Job status error: %s", exc)
+        return jsonify({"success": False, "error": str(exc)}), 500
 
-    logging.info("ADMIN SYNC: Completed - inserted=%d, updated=%d, errors=%d", inserted, updated, errors)
+    if not job or (not is_admin and job["requested_by"] != user_email):
+        return jsonify({"success": False, "error": "job_not_found"}), 404
 
-    return jsonify({
-        "success": True,
-        "datum_von": datum_von,
-        "datum_bis": datum_bis,
-        "total": len(publications),
-        "inserted": inserted,
-        "updated": updated,
-        "errors": errors
-    })
+    return jsonify({"success": True, "job": serialize_sync_job(job)})
 
 
 # ---------------------------- LEADS ----------------------------
 @zevix_bp.route("/zevix/leads", methods=["GET"])
 def get_leads():
     """
-    Returns leads from the database with optional filtering.
+    Returns leads from the database with optional filtering, newest first.
+    Paging: pass the returned ``next_cursor`` as ``cursor`` to get the next
+    page (``next_cursor`` is null on the last page). ``offset`` still works
+    without a cursor but gets slower the deeper the page.
     Requires a valid JWT token.
     """
     auth_header = request.headers.get("Authorization", "")
@@ -1812,10 +1486,21 @@ def get_leads():
         offset = int(request.args.get("offset", 0))
     except ValueError:
         offset = 0
+    cursor = request.args.get("cursor")
 
     conditions = []
     params = []
 
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_leads_cursor(cursor)
+        except ValueError:
+            return jsonify({"success": False, "error": "invalid_cursor"}), 400
+        # Keyset: continue after the last row of the previous page
+        conditions.append(f"({LEADS_SORT_DATE}, id) < (%s::date, %s)")
+        params.extend([cursor_date, cursor_id])
+        offset = 0
+
     if datum_von:
         conditions.append("publikation_datum >= %s")
         params.append(datum_von)
@@ -1834,15 +1519,12 @@ def get_leads():
     try:
         with get_conn() as conn:
             with conn.cursor() as cur:
-                ensure_leads_table(cur)
-                conn.commit()
-
                 query = f"""
                     SELECT id, uid, firma, rechtsform, strasse, hausnummer, plz, ort,
                            sitz, kanton, zweck, branche_ai, publikation_datum, created_at
                     FROM leads
                     {where_clause}
-                    ORDER BY publikation_datum DESC, id DESC
+                    ORDER BY {LEADS_SORT_DATE} DESC, id DESC
                     LIMIT %s OFFSET %s
                 """
                 params.extend([limit, offset])
@@ -1870,6 +1552,10 @@ def get_leads():
                         "created_at": created_at.isoformat() if created_at else None,
                     })
 
+                next_cursor = None
+                if rows and len(rows) == limit:
+                    next_cursor = encode_leads_cursor(rows[-1].get("publikation_datum"), rows[-1].get("id"))
+
     except Exception as exc:
         logging.error("Fehler beim Laden der Leads: %s", exc)
         return jsonify({"success": False, "error": str(exc)}), 500
@@ -1880,4 +1566,5 @@ def get_leads():
         "count": len(leads),
         "limit": limit,
         "offset": offset,
+        "next_cursor": next_cursor,
     })
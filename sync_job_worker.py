@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Worker process for queued SHAB sync jobs (/zevix/sync-shab, /zevix/admin/sync-range).
+Run directly: python sync_job_worker.py
+              python sync_job_worker.py --once   (process queued jobs, then exit)
+"""
+
+import os
+import sys
+import time
+import signal
+import logging
+import argparse
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Add project root to path so routes package can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes.zevix import get_conn
+from routes.migrations import run_migrations
+from routes.sync_jobs import claim_sync_job, run_sync_job, worker_name
+
+SYNC_JOB_POLL_SECONDS = float(os.getenv("SYNC_JOB_POLL_SECONDS", "5"))
+
+stopping = False
+
+
+def request_stop(signum, frame):
+    global stopping
+    logging.info("Signal %d received, stopping after the current job", signum)
+    stopping = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued SHAB sync jobs")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    worker = worker_name()
+    logging.info("=== SYNC WORKER %s started ===", worker)
+    migrated = False
+
+    while not stopping:
+        try:
+            with get_conn() as conn:
+                if not migrated:
+                    run_migrations(conn)
+                    migrated = True
+
+                while not stopping:
+                    job = claim_sync_job(conn, worker)
+                    if job is None:
+                        break
+                    logging.info("Job %d (%s) started: %s", job["id"], job["kind"], job["params"])
+                    progress = run_sync_job(conn, job)
+                    logging.info("Job %d finished: %s", job["id"], progress["stats"])
+
+        except Exception as exc:
+            logging.error("Worker error: %s", exc)
+
+        if args.once:
+            break
+        time.sleep(SYNC_JOB_POLL_SECONDS)
+
+    logging.info("=== SYNC WORKER %s stopped ===", worker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Train the local sector classifier from GPT-labelled leads.
+Usage: python train_branche_model.py --output models/branche_model.npz
+"""
+
+import os
+import sys
+import random
+import logging
+import argparse
+
+# Setup logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+# Add project root to path so routes package can be imported
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from routes.zevix import get_conn
+from routes.branche import canonical_branche, zweck_hash
+from routes.branche_model import BRANCHE_MODEL_PATH, BrancheModel
+
+
+def load_samples(limit: int, batch_size: int = 5000) -> list[tuple[str, str]]:
+    """(zweck, branche) pairs labelled by GPT, newest leads first, mapped onto the allowed list.
+
+    Only purposes with a branche_cache entry are used, with the cached label:
+    that table holds validated GPT answers only, while leads.branche_ai also
+    carries rule and model labels and "Sonstige" fallbacks.
+    """
+    samples = []
+    seen = set()
+    scanned = 0
+    with get_conn() as conn:
+        with conn.cursor(name="train_leads") as leads, conn.cursor() as cur:
+            leads.execute("SELECT zweck FROM leads WHERE coalesce(zweck, '') <> '' ORDER BY id DESC")
+            while len(samples) < limit:
+                rows = leads.fetchmany(batch_size)
+                if not rows:
+                    break
+                scanned += len(rows)
+                batch = {}
+                for row in rows:
+                    key = zweck_hash(row["zweck"])
+                    if key not in seen:
+                        seen.add(key)
+                        batch[key] = row["zweck"]
+                cur.execute(
+                    "SELECT zweck_hash, branche FROM branche_cache WHERE zweck_hash = ANY(%s)",
+                    (list(batch),),
+                )
+                for row in cur.fetchall():
+                    label = canonical_branche(row["branche"])
+                    if label:
+                        samples.append((batch[row["zweck_hash"]], label))
+
+    samples = samples[:limit]
+    logging.info("Scanned %d leads, %d purposes with a GPT label in branche_cache", scanned, len(samples))
+    return samples
+
+
+def evaluate(model: BrancheModel, samples: list[tuple[str, str]]) -> None:
+    """Log how many holdout samples the model would decide and how many it gets right."""
+    decided = 0
+    correct = 0
+    for text, label in samples:
+        predicted = model.predict_confident(text)
+        if predicted is None:
+            continue
+        decided += 1
+        correct += predicted == label
+    logging.info(
+        "Holdout: %d samples, coverage %.1f%%, precision %.1f%%",
+        len(samples),
+        100.0 * decided / len(samples) if samples else 0.0,
+        100.0 * correct / decided if decided else 0.0,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local sector classifier")
+    parser.add_argument("--output", type=str, default=BRANCHE_MODEL_PATH, help="Model file (.npz)")
+    parser.add_argument("--limit", type=int, default=200000, help="Max number of leads to train on")
+    parser.add_argument("--holdout", type=float, default=0.1, help="Share of samples kept for evaluation (default: 0.1)")
+    parser.add_argument("--max-features", type=int, default=20000, help="Vocabulary size (default: 20000)")
+    args = parser.parse_args()
+
+    samples = load_samples(args.limit)
+    if not samples:
+        logging.error("No labelled leads found, nothing to train")
+        sys.exit(1)
+
+    random.Random(42).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    train, holdout = samples[:split], samples[split:]
+
+    model = BrancheModel.train(train, max_features=args.max_features)
+    logging.info("Trained on %d samples: %d labels, %d features", len(train), len(model.labels), len(model.vocab))
+    if holdout:
+        evaluate(model, holdout)
+
+    # Final model uses all samples
+    model = BrancheModel.train(samples, max_features=args.max_features)
+    model.save(args.output)
+    logging.info("Saved model to %s (%.1f KB)", args.output, os.path.getsize(args.output) / 1024)
+
+
+if __name__ == "__main__":
+    main()